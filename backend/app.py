@@ -1,14 +1,26 @@
 import os
 import logging
 import time
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from dotenv import load_dotenv
 import re
 from logging_config import setup_logger
 from model_handler import conversation_handler
+from schema_linking import link_schema, schema_fingerprint
+from schema_prompt import normalize_schema, render_schema
+from schema_cache import schema_snapshot_cache
+from http_client import http_client
+from response_cache import response_cache
+from semantic_cache import semantic_query_cache, SEMANTIC_CACHE_ENABLED
+from llm_scheduler import llm_scheduler, SchedulerOverloaded
+from single_flight import single_flight
+from model_registry import model_registry
+from model_lifecycle import model_lifecycle, MODEL_PRELOAD
+from prefix_cache import prefix_context_cache
 import json
-import requests
+import itertools
+import threading
 
 # Load environment variables
 load_dotenv()
@@ -54,22 +66,19 @@ DB_FUNCTIONS = {
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint to verify the service is running."""
-    # Check if Ollama API is accessible
+    # Reads the model registry snapshot; probes run in the background
     try:
-        models_available = []
-        if model_handler.model_handler.is_model_available(model_handler.SCHEMA_MODEL_NAME):
-            models_available.append(model_handler.SCHEMA_MODEL_NAME)
-        if model_handler.model_handler.is_model_available(model_handler.QUERY_MODEL_NAME):
-            models_available.append(model_handler.QUERY_MODEL_NAME)
-            
+        registry = model_registry.snapshot()
+        
         return jsonify({
-            "status": "healthy", 
-            "ollama_api": "connected",
-            "gpu_available": model_handler.model_handler.is_gpu_available(),
-            "available_memory_mb": model_handler.model_handler.get_available_memory(),
-            "available_models": models_available,
+            "status": "healthy" if registry["ollama_reachable"] else "degraded", 
+            "ollama_api": "connected" if registry["ollama_reachable"] else "unreachable",
+            "gpu_available": registry["gpu_available"],
+            "available_memory_mb": registry["available_memory_mb"],
+            "available_models": available_models(),
             "current_model": model_handler.model_handler.current_model,
-            "supported_db_types": SUPPORTED_DB_TYPES
+            "supported_db_types": SUPPORTED_DB_TYPES,
+            "registry_age_seconds": registry["age_seconds"]
         }), 200
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
@@ -78,6 +87,93 @@ def health_check():
             "error": str(e)
         }), 500
 
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return jsonify({"status": "alive"}), 200
+
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: Ollama is reachable and the query model is installed, per the registry."""
+    ready, reasons = model_registry.readiness([model_handler.QUERY_MODEL_NAME])
+    if ready:
+        return jsonify({"status": "ready"}), 200
+    return jsonify({"status": "not_ready", "reasons": reasons}), 503
+
+def available_models():
+    """Configured models that are currently available."""
+    return [
+        model_name for model_name in (model_handler.SCHEMA_MODEL_NAME, model_handler.QUERY_MODEL_NAME)
+        if model_handler.model_handler.is_model_available(model_name)
+    ]
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Connection reuse and cache counters of the service's shared clients."""
+    return jsonify({
+        "http_client": http_client.stats(),
+        "schema_cache": schema_snapshot_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "semantic_cache": semantic_query_cache.stats(),
+        "scheduler": llm_scheduler.stats(),
+        "single_flight": single_flight.stats(),
+        "models": model_lifecycle.stats(),
+        "prefix_cache": prefix_context_cache.stats(),
+        "conversations": {
+            "active": len(model_handler.conversation_handler.conversations),
+            "model_context": model_handler.conversation_handler.context_stats
+        }
+    }), 200
+
+def overloaded_response(error):
+    """429/503 response for a request shed by the LLM scheduler."""
+    return jsonify({
+        "status": "error",
+        "message": str(error)
+    }), error.status_code, {"Retry-After": str(error.retry_after)}
+
+def wants_stream(data):
+    """Whether the client asked for Server-Sent Events via the body or the Accept header."""
+    return data.get("stream") is True or "text/event-stream" in request.headers.get("Accept", "")
+
+def sse_event(payload, event=None):
+    """Format one Server-Sent Events message with a JSON payload."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+def sse_response(chunks, on_complete, start_time):
+    """
+    Stream model output as SSE: a {"token": ...} message per chunk, then a
+    "done" event with on_complete(full_text), or an "error" event on failure.
+    The first chunk is awaited before responding, so a request shed by the
+    scheduler or failing upfront still gets a regular error status.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+
+    def generate():
+        parts = []
+        try:
+            for chunk in itertools.chain([first] if first is not None else [], chunks):
+                parts.append(chunk)
+                yield sse_event({"token": chunk})
+            payload = on_complete("".join(parts))
+            payload["execution_time_seconds"] = round(time.time() - start_time, 2)
+            yield sse_event(payload, event="done")
+        except Exception as e:
+            logger.exception(f"Error while streaming response: {str(e)}")
+            yield sse_event({
+                "status": "error",
+                "message": str(e),
+                "execution_time_seconds": round(time.time() - start_time, 2)
+            }, event="error")
+
+    response = Response(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop reverse proxies from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
 @app.route('/generate-schema', methods=['POST'])
 def generate_schema():
     """Endpoint to generate database schema based on input prompt."""
@@ -106,8 +202,27 @@ def generate_schema():
         
         logger.info(f"Processing schema generation: {input_prompt[:50]}...")
         
+        if wants_stream(data):
+            def schema_done(raw_response):
+                json_schema = extract_json_schema(raw_response)
+                if not json_schema:
+                    logger.error(f"Failed to parse streamed schema. Raw response: {raw_response}")
+                    return {
+                        "status": "error",
+                        "message": "Failed to parse schema response.",
+                        "raw_response": raw_response
+                    }
+                return {
+                    "status": "success",
+                    "schema": json_schema,
+                    "formatted_output": format_schema_for_display(json_schema)
+                }
+            
+            chunks = model_handler.stream_schema(enhanced_prompt, use_cache=not data.get('bypass_cache', False))
+            return sse_response(chunks, schema_done, start_time)
+        
         # Get the raw response from model handler
-        raw_response = model_handler.generate_schema(enhanced_prompt)
+        raw_response = model_handler.generate_schema(enhanced_prompt, use_cache=not data.get('bypass_cache', False))
         logger.debug(f"Raw model response: {raw_response}")
         
         # Process the response
@@ -131,6 +246,9 @@ def generate_schema():
                 "execution_time_seconds": round(elapsed_time, 2)
             }), 400
             
+    except SchedulerOverloaded as e:
+        return overloaded_response(e)
+        
     except Exception as e:
         elapsed_time = time.time() - start_time
         logger.exception(f"Error in generate_schema: {str(e)}")
@@ -140,8 +258,6 @@ def generate_schema():
             "execution_time_seconds": round(elapsed_time, 2)
         }), 500
 
-SECONDARY_SERVICE_URL = os.environ.get("SECONDARY_SERVICE_URL", "http://localhost:5002")
-
 @app.route('/generate-query', methods=['POST'])
 def generate_query():
     """Enhanced endpoint with automatic schema detection"""
@@ -166,50 +282,88 @@ def generate_query():
         
         input_prompt = data.get('prompt')
         database_type = data.get('database_type', 'postgres').lower()
-        schema_context = data.get('schema', '')
+        # Accept tables as a list, a dict or a (JSON) string without double-encoding them
+        schema_context = normalize_schema(data.get('schema', ''))
         
-        # Auto-fetch schema if not provided and connected
+        # Use the cached schema snapshot of the connected database if none was provided
         auto_schema_used = False
+        schema_version = None
+        schema_identity = None
         if not schema_context:
-            try:
-                # Check connection status
-                status_resp = requests.get(f"{SECONDARY_SERVICE_URL}/connection-status")
-                if status_resp.status_code == 200 and status_resp.json().get("is_connected"):
-                    schema_resp = requests.get(f"{SECONDARY_SERVICE_URL}/get-full-schema")
-                    if schema_resp.status_code == 200:
-                        schema_context = schema_resp.json().get("tables", [])
-                        database_type = status_resp.json().get("dbType", database_type)
-                        auto_schema_used = True
-                        logger.info(f"Auto-fetched schema with {len(schema_context)} tables")
-            except Exception as e:
-                logger.warning(f"Schema auto-fetch failed: {str(e)}")
+            snapshot = schema_snapshot_cache.get()
+            if snapshot:
+                schema_context = normalize_schema(snapshot["tables"])
+                database_type = snapshot["db_type"] or database_type
+                schema_version = snapshot["etag"]
+                schema_identity = snapshot.get("identity")
+                auto_schema_used = True
+                logger.info(f"Using cached schema with {len(schema_context)} tables")
+
+        # Near-duplicate questions against the same schema reuse earlier validated SQL
+        use_cache = not data.get('bypass_cache', False)
+        if not schema_version and schema_context:
+            schema_version = schema_fingerprint(schema_context if isinstance(schema_context, list) else [schema_context])
+        # Auto schemas are scoped to the confirmed connection, so another database never reuses its SQL
+        cache_scope = (database_type, schema_version) + ((schema_identity,) if schema_identity else ())
+        if use_cache and SEMANTIC_CACHE_ENABLED:
+            cached = semantic_query_cache.lookup(input_prompt, cache_scope)
+            if cached:
+                logger.info(f"Semantic cache hit ({cached['similarity']}) for: {input_prompt[:50]}")
+                return jsonify({
+                    "status": "success",
+                    "query": cached["sql"],
+                    "database_type": database_type,
+                    "is_valid": True,
+                    "validation_message": "Valid query",
+                    "auto_schema_used": auto_schema_used,
+                    "cached": {"matched_prompt": cached["question"], "similarity": cached["similarity"]},
+                    "execution_time_seconds": round(time.time() - start_time, 2)
+                }), 200
 
         # Original prompt enhancement logic
         db_functions = generate_db_function_reference(database_type)
         
-        enhanced_prompt = (
-            f"### Task\nGenerate a {database_type.upper()} SQL query for:\n{input_prompt}\n\n"
-            f"### Database Type\n{database_type.upper()}\n\n"
-        )
-        
-        if schema_context:
-            enhanced_prompt += f"### Database Schema\n{json.dumps(schema_context, indent=2)}\n\n"
-            
-        enhanced_prompt += (
+        # Keep only the tables relevant to the question (plus FK neighbours) within the token budget
+        schema_tables_used = None
+        prefix_scope = cache_scope
+        if isinstance(schema_context, list) and schema_context:
+            linked = link_schema(input_prompt, schema_context, fingerprint=schema_version)
+            if len(linked) < len(schema_context):
+                # Schema order (not relevance order) keeps the prompt prefix identical
+                # for every question that links to the same subset
+                position = {table["name"]: index for index, table in enumerate(schema_context)}
+                schema_context = sorted(linked, key=lambda table: position.get(table["name"], len(position)))
+                prefix_scope = cache_scope + (schema_fingerprint(schema_context),)
+            schema_tables_used = [t["name"] for t in schema_context]
+            logger.info(f"Schema linking kept {len(schema_tables_used)} tables: {schema_tables_used}")
+        
+        # Compact pseudo-DDL costs a fraction of the tokens of indented JSON
+        dialect_section = f"### Database Type\n{database_type.upper()}\n\n"
+        schema_section = f"### Database Schema\n{render_schema(schema_context)}\n\n" if schema_context else ""
+        instructions = (
             f"### Important Instructions\n"
             f"1. Use proper {database_type.upper()} syntax\n"
             f"2. Include all necessary built-in functions\n"
             f"3. Return only the SQL query wrapped in ```sql ```\n\n"
             f"### Function Reference\n{db_functions}\n\n"
-            f"### SQL Query\n"
         )
+        task = f"### Task\nGenerate a {database_type.upper()} SQL query for:\n{input_prompt}\n\n"
         
         # Original query generation logic
         logger.info(f"Generating query for {database_type}")
-        sql_query = model_handler.generate_query(enhanced_prompt)
+        # Everything but the question is the same for every request on this schema (or linked
+        # subset): send it first as a prefix the model processes once per scope and dialect
+        sql_query = model_handler.generate_query(
+            task + "### SQL Query\n",
+            use_cache=use_cache,
+            schema_prefix=dialect_section + schema_section + instructions,
+            prefix_scope=prefix_scope
+        )
         
         # Original validation logic
         is_valid, error_message = validate_sql_syntax(sql_query, database_type)
+        if is_valid and SEMANTIC_CACHE_ENABLED:
+            semantic_query_cache.store(input_prompt, cache_scope, sql_query)
         
         elapsed_time = time.time() - start_time
         
@@ -220,9 +374,13 @@ def generate_query():
             "is_valid": is_valid,
             "validation_message": error_message if not is_valid else "Valid query",
             "auto_schema_used": auto_schema_used,
+            "schema_tables_used": schema_tables_used,
             "execution_time_seconds": round(elapsed_time, 2)
         }), 200
         
+    except SchedulerOverloaded as e:
+        return overloaded_response(e)
+        
     except Exception as e:
         elapsed_time = time.time() - start_time
         logger.exception(f"Error in generate_query: {str(e)}")
@@ -509,11 +667,35 @@ def explain_query():
         # Generate explanation or answer follow-up
         logger.info(f"Processing {'follow-up' if is_followup else 'initial explanation'} for session {session_id}")
         
+        if wants_stream(data):
+            chunks = model_handler.stream_explain_sql_query(
+                session_id=session_id,
+                query=query,
+                database_type=database_type,
+                question=question,
+                use_cache=not data.get('bypass_cache', False)
+            )
+            
+            def explanation_done(response):
+                # The exchange is already in the history once the stream has completed
+                context = model_handler.conversation_handler.get_conversation_context(session_id)
+                return {
+                    "status": "success",
+                    "session_id": session_id,
+                    "database_type": context["database_type"],
+                    "query": context["query"],
+                    "history_length": len(context["history"]),
+                    "is_followup": is_followup
+                }
+            
+            return sse_response(chunks, explanation_done, start_time)
+        
         response = model_handler.explain_sql_query(
             session_id=session_id,
             query=query,
             database_type=database_type,
-            question=question
+            question=question,
+            use_cache=not data.get('bypass_cache', False)
         )
         
         elapsed_time = time.time() - start_time
@@ -533,6 +715,9 @@ def explain_query():
             "execution_time_seconds": round(elapsed_time, 2)
         }), 200
         
+    except SchedulerOverloaded as e:
+        return overloaded_response(e)
+        
     except Exception as e:
         elapsed_time = time.time() - start_time
         logger.exception(f"Error in explain_query endpoint: {str(e)}")
@@ -607,8 +792,12 @@ def nlp_task():
             
         logger.info(f"Processing NLP task request: {input_prompt[:50]}...")
         
+        if wants_stream(data):
+            chunks = model_handler.stream_text(input_prompt, use_cache=not data.get('bypass_cache', False))
+            return sse_response(chunks, lambda response: {"status": "success"}, start_time)
+        
         # Send to model handler
-        response = model_handler.generate_text(input_prompt)
+        response = model_handler.generate_text(input_prompt, use_cache=not data.get('bypass_cache', False))
         
         elapsed_time = time.time() - start_time
         logger.info(f"NLP task completed in {elapsed_time:.2f}s")
@@ -619,6 +808,9 @@ def nlp_task():
             "execution_time_seconds": round(elapsed_time, 2)
         }), 200
         
+    except SchedulerOverloaded as e:
+        return overloaded_response(e)
+        
     except Exception as e:
         elapsed_time = time.time() - start_time
         logger.exception(f"Error in nlp_task endpoint: {str(e)}")
@@ -635,24 +827,18 @@ def model_status():
     Endpoint to check the status of available models.
     """
     try:
-        available_models = []
-        
-        # Check which models are available
-        schema_model_available = model_handler.model_handler.is_model_available(model_handler.SCHEMA_MODEL_NAME)
-        query_model_available = model_handler.model_handler.is_model_available(model_handler.QUERY_MODEL_NAME)
-        
-        if schema_model_available:
-            available_models.append(model_handler.SCHEMA_MODEL_NAME)
-        if query_model_available:
-            available_models.append(model_handler.QUERY_MODEL_NAME)
+        registry = model_registry.snapshot()
             
         return jsonify({
             "status": "success",
             "current_model": model_handler.model_handler.current_model,
-            "available_models": available_models,
-            "gpu_available": model_handler.model_handler.is_gpu_available(),
-            "available_memory_mb": model_handler.model_handler.get_available_memory(),
-            "supported_db_types": SUPPORTED_DB_TYPES
+            "available_models": available_models(),
+            "loaded_models": registry["loaded_models"],
+            "lifecycle": model_lifecycle.stats(),
+            "gpu_available": registry["gpu_available"],
+            "available_memory_mb": registry["available_memory_mb"],
+            "supported_db_types": SUPPORTED_DB_TYPES,
+            "registry_age_seconds": registry["age_seconds"]
         }), 200
         
     except Exception as e:
@@ -697,7 +883,8 @@ def load_model():
             return jsonify({
                 "status": "success",
                 "message": f"Model {model_name} loaded successfully",
-                "current_model": model_handler.model_handler.current_model
+                "current_model": model_handler.model_handler.current_model,
+                "load_stats": model_lifecycle.stats()["models"].get(model_name)
             }), 200
         else:
             return jsonify({
@@ -716,14 +903,20 @@ def load_model():
 @app.route('/models/unload', methods=['POST'])
 def unload_model():
     """
-    Endpoint to explicitly unload the current model by restarting Ollama.
+    Endpoint to explicitly unload a model (the current one by default).
+    
+    Optional JSON input:
+    {
+        "model_name": "mistral:7b-instruct"
+    }
     """
     try:
-        if model_handler.model_handler.current_model:
-            current_model = model_handler.model_handler.current_model
-            
-            # Attempt to unload using the new restart-based method
-            if model_handler.model_handler.unload_model():
+        data = request.get_json(silent=True) or {}
+        current_model = data.get('model_name') or model_handler.model_handler.current_model
+        
+        if current_model:
+            # Ask Ollama to release the model (keep_alive 0)
+            if model_handler.model_handler.unload_model(current_model):
                 return jsonify({
                     "status": "success",
                     "message": f"Model {current_model} unloaded successfully"
@@ -1077,6 +1270,18 @@ if __name__ == "__main__":
     logger.info(f"Starting Flask server on port {port}, debug mode: {debug_mode}")
     logger.info(f"Supported database types: {', '.join(SUPPORTED_DB_TYPES)}")
     
+    # Populate the model registry once before serving; it refreshes in the background afterwards
+    model_registry.refresh()
+    
+    # Load and pin the hot models in the background so the service starts serving immediately
+    if MODEL_PRELOAD:
+        threading.Thread(
+            target=model_lifecycle.preload,
+            args=([model_handler.QUERY_MODEL_NAME, model_handler.EXPLANATION_MODEL_NAME],),
+            name="model-preload",
+            daemon=True
+        ).start()
+    
     if model_handler.model_handler.is_gpu_available():
         logger.info("GPU is available for model execution")
     else:
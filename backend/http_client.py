@@ -0,0 +1,170 @@
+import os
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+from logging_config import setup_logger
+
+# Setup logger
+logger = setup_logger('http_client')
+
+# Configuration from environment variables
+HTTP_POOL_HOSTS = int(os.environ.get("HTTP_POOL_HOSTS", 10))
+# Maximum open connections per host; further requests wait for a free one
+HTTP_POOL_PER_HOST = int(os.environ.get("HTTP_POOL_PER_HOST", 10))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 3))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", os.environ.get("REQUEST_TIMEOUT", 120)))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", 0.25))
+HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", 4))
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def request_was_sent(error):
+    """Whether a failed request may have reached the server (unsafe to replay if not idempotent)."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return False
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return not isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class HttpClient:
+    """
+    Shared keep-alive HTTP client. One pooled session serves every backend,
+    with a bounded pool per host, separate connect/read timeouts and retries:
+    connection failures are retried for any method (nothing was sent), while
+    read timeouts and 429/5xx responses are retried only for idempotent calls.
+    """
+
+    def __init__(self, pool_hosts=HTTP_POOL_HOSTS, pool_per_host=HTTP_POOL_PER_HOST):
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_hosts,
+            pool_maxsize=pool_per_host,
+            pool_block=True,
+            max_retries=0
+        )
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self._lock = threading.Lock()
+        self._hosts = {}  # host -> counters
+
+    def request(self, method, url, timeout=None, idempotent=None, retries=HTTP_MAX_RETRIES, **kwargs):
+        """
+        Send a request through the shared session.
+
+        Args:
+            timeout (float | tuple): read timeout or (connect, read); defaults to the configured pair
+            idempotent (bool): allow retrying after the request was sent; defaults by method
+        """
+        method = method.upper()
+        if timeout is None:
+            timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        elif not isinstance(timeout, tuple):
+            timeout = (min(HTTP_CONNECT_TIMEOUT, timeout), timeout)
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            start = time.time()
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt < retries and (idempotent or not request_was_sent(e)):
+                    self._retry(host, method, url, attempt, e)
+                    attempt += 1
+                    continue
+                self._record(host, time.time() - start, error=True)
+                raise
+
+            if response.status_code in RETRY_STATUS_CODES and idempotent and attempt < retries:
+                response.close()
+                self._retry(host, method, url, attempt, f"HTTP {response.status_code}")
+                attempt += 1
+                continue
+
+            self._record(host, time.time() - start)
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """Per-host request counters plus connection reuse from the urllib3 pools."""
+        pools = {}
+        pool_manager = self.adapter.poolmanager
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.host}:{pool.port}"
+            opened = pool.num_connections
+            served = pool.num_requests
+            pools[host] = {
+                "connections_opened": opened,
+                "requests": served,
+                "reuse_ratio": round(1 - opened / served, 4) if served else 0.0
+            }
+
+        with self._lock:
+            hosts = {
+                host: dict(counters, avg_latency_ms=round(1000 * counters["latency"] / counters["requests"], 1)
+                           if counters["requests"] else 0.0)
+                for host, counters in self._hosts.items()
+            }
+        for counters in hosts.values():
+            counters.pop("latency")
+        return {"hosts": hosts, "pools": pools}
+
+    def _retry(self, host, method, url, attempt, reason):
+        delay = backoff_delay(attempt)
+        logger.warning(f"{method} {url} failed ({reason}); retry {attempt + 1} in {delay:.2f}s")
+        with self._lock:
+            self._counters(host)["retries"] += 1
+        time.sleep(delay)
+
+    def _record(self, host, elapsed, error=False):
+        with self._lock:
+            counters = self._counters(host)
+            counters["requests"] += 1
+            counters["latency"] += elapsed
+            if error:
+                counters["errors"] += 1
+
+    def _counters(self, host):
+        return self._hosts.setdefault(host, {"requests": 0, "errors": 0, "retries": 0, "latency": 0.0})
+
+
+# Initialize a global instance of HttpClient
+http_client = HttpClient()
+
+
+def build_openai_http_client():
+    """
+    httpx client for the OpenAI-compatible SDK with the same pool limits and
+    timeouts. The transport retries only failed connection attempts, so pair
+    it with max_retries=0 on the SDK to avoid replaying generations.
+    """
+    import httpx
+    return httpx.Client(
+        transport=httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=HTTP_POOL_PER_HOST, max_keepalive_connections=HTTP_POOL_PER_HOST),
+            retries=HTTP_MAX_RETRIES
+        ),
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    )
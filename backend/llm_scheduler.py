@@ -0,0 +1,175 @@
+import os
+import math
+import heapq
+import time
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from logging_config import setup_logger
+
+# Setup logger
+logger = setup_logger('llm_scheduler')
+
+# Configuration from environment variables
+# A single local Ollama instance serves one generation at a time efficiently
+OLLAMA_CONCURRENCY = int(os.environ.get("OLLAMA_CONCURRENCY", 1))
+AKASH_CONCURRENCY = int(os.environ.get("AKASH_CONCURRENCY", 4))
+LLM_QUEUE_MAX_DEPTH = int(os.environ.get("LLM_QUEUE_MAX_DEPTH", 16))
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", 30))
+
+# Priority classes, lower runs first
+PRIORITY_INTERACTIVE = 0  # generate-query, explain-query
+PRIORITY_NORMAL = 1       # generate-schema
+PRIORITY_BATCH = 2        # nlp-task
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_NORMAL: "normal", PRIORITY_BATCH: "batch"}
+
+# Share of the queue depth each class may fill, so background work is shed
+# before it can crowd interactive requests out of the queue
+QUEUE_SHARE = {PRIORITY_INTERACTIVE: 1.0, PRIORITY_NORMAL: 0.75, PRIORITY_BATCH: 0.5}
+
+# Number of recent queue waits kept for percentiles
+WAIT_SAMPLES = 500
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a request is shed; carries the HTTP status and a Retry-After hint."""
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class BackendQueue:
+    """Concurrency slots of one backend with a priority queue of waiting requests."""
+
+    def __init__(self, name, limit, max_depth):
+        self.name = name
+        self.limit = limit
+        self.max_depth = max_depth
+        self.active = 0
+        self.waiters = []  # heap of [priority, sequence, event, granted]
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.service_time = 0.0
+        self.counters = {"admitted": 0, "completed": 0, "rejected": 0, "timed_out": 0}
+        self.by_priority = {name: {"admitted": 0, "rejected": 0} for name in PRIORITY_NAMES.values()}
+
+    def retry_after(self):
+        """Seconds until the queue has likely drained enough to admit a request."""
+        completed = self.counters["completed"]
+        avg_service = self.service_time / completed if completed else 1.0
+        return max(1, math.ceil(avg_service * (len(self.waiters) + 1) / self.limit))
+
+
+class LLMScheduler:
+    """
+    Admission control for LLM calls. Each backend has a fixed number of
+    concurrent slots; excess requests wait in a priority queue (FIFO within a
+    class) up to a per-class depth and a maximum wait, and are otherwise shed
+    with 429 (queue full) or 503 (waited too long).
+    """
+
+    def __init__(self, limits=None, max_depth=LLM_QUEUE_MAX_DEPTH, timeout=LLM_QUEUE_TIMEOUT):
+        limits = limits or {"ollama": OLLAMA_CONCURRENCY, "akash": AKASH_CONCURRENCY}
+        self.timeout = timeout
+        self._queues = {name: BackendQueue(name, max(1, limit), max_depth) for name, limit in limits.items()}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, backend, priority=PRIORITY_NORMAL):
+        """Hold one concurrency slot of `backend` for the duration of the block."""
+        queue = self._queues[backend]
+        waited = self._acquire(queue, priority)
+        start = time.time()
+        try:
+            yield waited
+        finally:
+            self._release(queue, time.time() - start)
+
+    def stats(self):
+        """Per-backend slot usage, queue depth, shed counts and queue-wait percentiles."""
+        with self._lock:
+            result = {}
+            for name, queue in self._queues.items():
+                waits = sorted(queue.waits)
+                result[name] = {
+                    "limit": queue.limit,
+                    "active": queue.active,
+                    "queued": len(queue.waiters),
+                    "max_depth": queue.max_depth,
+                    **queue.counters,
+                    "by_priority": {key: dict(value) for key, value in queue.by_priority.items()},
+                    "queue_wait_ms": {
+                        "avg": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+                        "p50": round(1000 * waits[len(waits) // 2], 1) if waits else 0.0,
+                        "p95": round(1000 * waits[int(len(waits) * 0.95)], 1) if waits else 0.0,
+                        "max": round(1000 * waits[-1], 1) if waits else 0.0
+                    }
+                }
+            return result
+
+    def _acquire(self, queue, priority):
+        """Take a slot, queueing if necessary; returns the seconds spent waiting."""
+        priority_name = PRIORITY_NAMES.get(priority, "normal")
+        with self._lock:
+            if queue.active < queue.limit and not queue.waiters:
+                queue.active += 1
+                self._admitted(queue, priority_name, 0.0)
+                return 0.0
+
+            depth_limit = max(1, int(queue.max_depth * QUEUE_SHARE.get(priority, 1.0)))
+            if len(queue.waiters) >= depth_limit:
+                queue.counters["rejected"] += 1
+                queue.by_priority[priority_name]["rejected"] += 1
+                retry_after = queue.retry_after()
+                logger.warning(f"Shedding {priority_name} request for {queue.name}: {len(queue.waiters)} queued")
+                raise SchedulerOverloaded(
+                    f"{queue.name} backend is busy, retry in {retry_after}s", 429, retry_after
+                )
+
+            waiter = [priority, next(self._sequence), threading.Event(), False]
+            heapq.heappush(queue.waiters, waiter)
+
+        start = time.time()
+        waiter[2].wait(self.timeout)
+        waited = time.time() - start
+
+        with self._lock:
+            # The slot may have been handed over just as the wait timed out
+            if waiter[3]:
+                self._admitted(queue, priority_name, waited)
+                return waited
+            queue.waiters.remove(waiter)
+            heapq.heapify(queue.waiters)
+            queue.counters["timed_out"] += 1
+            queue.by_priority[priority_name]["rejected"] += 1
+            retry_after = queue.retry_after()
+
+        logger.warning(f"{priority_name} request for {queue.name} waited {waited:.1f}s without a slot")
+        raise SchedulerOverloaded(
+            f"{queue.name} backend is overloaded, retry in {retry_after}s", 503, retry_after
+        )
+
+    def _release(self, queue, elapsed):
+        with self._lock:
+            queue.counters["completed"] += 1
+            queue.service_time += elapsed
+            if queue.waiters:
+                # Hand the slot directly to the highest-priority waiter
+                waiter = heapq.heappop(queue.waiters)
+                waiter[3] = True
+                waiter[2].set()
+            else:
+                queue.active -= 1
+
+    def _admitted(self, queue, priority_name, waited):
+        queue.counters["admitted"] += 1
+        queue.by_priority[priority_name]["admitted"] += 1
+        queue.waits.append(waited)
+
+
+# Initialize a global instance of LLMScheduler
+llm_scheduler = LLMScheduler()
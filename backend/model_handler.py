@@ -1,11 +1,16 @@
 import os
 import json
-import requests
 import logging
 import time
-import psutil
 from dotenv import load_dotenv
 from logging_config import setup_logger
+from http_client import http_client, build_openai_http_client, HTTP_CONNECT_TIMEOUT
+from response_cache import response_cache, cache_key
+from single_flight import single_flight
+from model_registry import model_registry
+from model_lifecycle import model_lifecycle
+from prefix_cache import prefix_context_cache, PREFIX_CACHE_ENABLED
+from llm_scheduler import llm_scheduler, SchedulerOverloaded, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BATCH
 import openai
 import re
 
@@ -38,59 +43,136 @@ class ModelHandler:
             try:
                 self.akash_client = openai.OpenAI(
                     api_key=os.environ["AKASH_API_KEY"],
-                    base_url=AKASH_API_BASE
+                    base_url=AKASH_API_BASE,
+                    http_client=build_openai_http_client(),
+                    # Generations are not replayed; the transport retries connection failures only
+                    max_retries=0
                 )
             except Exception as e:
                 logger.error(f"Failed to initialize Akash client: {str(e)}")
-        
-        self.current_model = None
 
-    def is_gpu_available(self):
+    @property
+    def current_model(self):
+        """Most recently loaded or used Ollama model"""
+        return model_lifecycle.current_model
+
+    def load_model(self, model_name):
         """
-        Check if CUDA GPU is available.
+        Load a model into Ollama ahead of use, evicting cold models if memory is short.
+        Models served by the Akash API need no loading.
         """
+        if self.backend_for(model_name) != "ollama":
+            return True
+        if not self.is_model_available(model_name):
+            logger.error(f"Model {model_name} is not installed in Ollama")
+            return False
         try:
-            import subprocess
-            result = subprocess.run(['nvidia-smi'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            return result.returncode == 0
-        except:
+            # Loading competes with generations for the same Ollama instance
+            with llm_scheduler.slot("ollama", PRIORITY_NORMAL):
+                model_lifecycle.load(model_name)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to load model {model_name}: {str(e)}")
             return False
 
+    def unload_model(self, model_name=None):
+        """Release a model (the current one by default) from Ollama memory"""
+        model_name = model_name or self.current_model
+        if not model_name:
+            return True
+        try:
+            with llm_scheduler.slot("ollama", PRIORITY_NORMAL):
+                model_lifecycle.unload(model_name)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to unload model {model_name}: {str(e)}")
+            return False
+
+    def is_gpu_available(self):
+        """
+        Check if CUDA GPU is available (from the model registry snapshot).
+        """
+        return model_registry.snapshot()["gpu_available"]
+
     def get_available_memory(self):
         """
-        Get available GPU or system memory in MB.
+        Get available GPU or system memory in MB (from the model registry snapshot).
         """
-        if self.is_gpu_available():
-            try:
-                import subprocess
-                result = subprocess.run(
-                    ['nvidia-smi', '--query-gpu=memory.free', '--format=csv,nounits,noheader'],
-                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
-                )
-                return int(result.stdout.strip())
-            except:
-                pass
-        
-        return psutil.virtual_memory().available // (1024 * 1024)
+        return model_registry.snapshot()["available_memory_mb"]
 
     def is_model_available(self, model_name):
         """Check model availability - different checks for each backend"""
         if model_name == SCHEMA_MODEL_NAME:
             return True  # DeepSeek is always available via API
-        else:
-        # Ollama model check for SQLCoder
-            try:
-                response = requests.get(f"{OLLAMA_API_BASE.replace('/api', '')}/api/tags", 
-                                  timeout=REQUEST_TIMEOUT)  # Use REQUEST_TIMEOUT
-                if response.status_code == 200:
-                    models = response.json().get("models", [])
-                    return any(m.get("name", "").startswith(model_name) for m in models)
-                return False
-            except Exception as e:
-                logger.error(f"Error checking model availability: {str(e)}")
-                return False
+        # Ollama models are read from the periodically refreshed registry
+        return model_registry.is_model_installed(model_name)
 
-    def generate_response(self, prompt, model_name, max_tokens=MAX_TOKENS, temperature=TEMPERATURE):
+    def generate_response(self, prompt, model_name, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, use_cache=True,
+                          priority=PRIORITY_NORMAL, stop=None, stop_when=None, context=None):
+        """
+        Serve identical low-temperature generations from the response cache, else generate.
+        Concurrent identical requests share a single backend call. With stop_when the
+        response is streamed and cut short as in stream_response; context continues
+        from an earlier Ollama context.
+        """
+        key = cache_key(model_name, prompt, temperature, max_tokens, context)
+        cacheable = use_cache and response_cache.is_cacheable(temperature)
+        if not use_cache:
+            response_cache.record_bypass()
+        elif cacheable:
+            cached = response_cache.get(key)
+            if cached is not None:
+                logger.info(f"Response cache hit for {model_name}")
+                return cached
+        
+        def run():
+            # Cache hits above never occupy a backend slot
+            with llm_scheduler.slot(self.backend_for(model_name), priority):
+                if stop_when:
+                    response = "".join(self._stream_until(prompt, model_name, max_tokens, temperature, stop, stop_when,
+                                                          context))
+                else:
+                    response = self._generate(prompt, model_name, max_tokens, temperature, context)
+            if cacheable:
+                response_cache.put(key, model_name, response)
+            return response
+        
+        return single_flight.do((key, tuple(stop or ()), stop_when), run)
+
+    def prime_context(self, prompt, model_name, priority=PRIORITY_NORMAL):
+        """
+        Process a prompt prefix once and return its Ollama context, so later
+        requests can continue from it instead of re-sending the prefix.
+        """
+        with llm_scheduler.slot(self.backend_for(model_name), priority):
+            model_lifecycle.ensure_loaded(model_name)
+            response = http_client.post(
+                f"{OLLAMA_API_BASE}/generate",
+                json={
+                    "model": model_name,
+                    "prompt": prompt,
+                    "stream": False,
+                    "keep_alive": model_lifecycle.keep_alive(model_name),
+                    # Ollama treats num_predict 0 as unlimited, so generate one token and drop it below
+                    "options": {"temperature": 0, "num_predict": 1}
+                },
+                timeout=(HTTP_CONNECT_TIMEOUT, REQUEST_TIMEOUT)
+            )
+            if response.status_code != 200:
+                raise Exception(f"Ollama API error: {response.status_code}")
+            data = response.json()
+            tokens = data.get("context")
+            # The context ends with the generated tokens; keep exactly the prefix
+            generated = data.get("eval_count", 0) if data.get("response") else 0
+            if not tokens or generated >= len(tokens):
+                return None
+            return tokens[:len(tokens) - generated] if generated else tokens
+
+    def backend_for(self, model_name):
+        """Scheduler backend serving a model"""
+        return "akash" if model_name == SCHEMA_MODEL_NAME else "ollama"
+
+    def _generate(self, prompt, model_name, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, context=None):
         """Route to appropriate backend based on model name"""
         # Route to Akash API only for DeepSeek model
         if model_name == SCHEMA_MODEL_NAME:
@@ -112,18 +194,23 @@ class ModelHandler:
         # Default to Ollama for SQLCoder and other models
         else:
             try:
-                response = requests.post(
+                model_lifecycle.ensure_loaded(model_name)
+                # Not idempotent: a replay after a read timeout would rerun the whole generation
+                # while holding the scheduler slot, so only unsent requests are retried
+                response = http_client.post(
                     f"{OLLAMA_API_BASE}/generate",
                     json={
                         "model": model_name,
                         "prompt": prompt,
                         "stream": False,
+                        "keep_alive": model_lifecycle.keep_alive(model_name),
+                        **({"context": context} if context else {}),
                         "options": {
                             "temperature": temperature,
                             "num_predict": max_tokens
                         }
                     },
-                    timeout=REQUEST_TIMEOUT
+                    timeout=(HTTP_CONNECT_TIMEOUT, REQUEST_TIMEOUT)
                 )
                 if response.status_code != 200:
                     raise Exception(f"Ollama API error: {response.status_code}")
@@ -132,6 +219,122 @@ class ModelHandler:
                 logger.error(f"Ollama API error: {str(e)}")
                 raise Exception(f"Ollama API error: {str(e)}")
     
+    def stream_response(self, prompt, model_name, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, use_cache=True,
+                        stop=None, stop_when=None, priority=PRIORITY_NORMAL, context=None, result=None):
+        """
+        Yield response text chunks as the backend produces them; cached responses arrive as one chunk.
+        
+        Args:
+            stop (list): stop sequences passed to the backend
+            stop_when (callable): called with the text so far; a truthy result ends the
+                stream and aborts generation, and the text so far is cached as the response
+            context (list): Ollama context from an earlier response to continue from
+            result (dict): receives the Ollama "context" of this response when it completes
+        """
+        key = None
+        if not use_cache:
+            response_cache.record_bypass()
+        elif response_cache.is_cacheable(temperature):
+            key = cache_key(model_name, prompt, temperature, max_tokens, context)
+            cached = response_cache.get(key)
+            if cached is not None:
+                logger.info(f"Response cache hit for {model_name}")
+                yield cached
+                return
+        
+        chunks = []
+        # The slot is held until the stream finishes or the consumer closes it
+        with llm_scheduler.slot(self.backend_for(model_name), priority):
+            for chunk in self._stream_until(prompt, model_name, max_tokens, temperature, stop, stop_when,
+                                            context, result):
+                chunks.append(chunk)
+                yield chunk
+        
+        if key:
+            response_cache.put(key, model_name, "".join(chunks))
+
+    def _stream_until(self, prompt, model_name, max_tokens, temperature, stop=None, stop_when=None,
+                      context=None, result=None):
+        """Backend stream that ends as soon as stop_when(text so far) is truthy"""
+        text = ""
+        backend_stream = self._stream(prompt, model_name, max_tokens, temperature, stop, context, result)
+        for chunk in backend_stream:
+            yield chunk
+            if stop_when:
+                text += chunk
+                if stop_when(text):
+                    # Closing the generator closes the HTTP stream, which cancels generation
+                    backend_stream.close()
+                    logger.info(f"Stopped {model_name} early after {len(text)} characters")
+                    return
+
+    def _stream(self, prompt, model_name, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, stop=None,
+                context=None, result=None):
+        """Streaming counterpart of _generate; Ollama calls can continue from and report a context"""
+        if model_name == SCHEMA_MODEL_NAME:
+            if not self.akash_client:
+                raise Exception("Akash API client not initialized")
+            
+            try:
+                stream = self.akash_client.chat.completions.create(
+                    model=model_name,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stop=stop,
+                    stream=True
+                )
+                try:
+                    for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+                finally:
+                    stream.close()
+            except Exception as e:
+                logger.error(f"Akash API error: {str(e)}")
+                raise Exception(f"Akash API error: {str(e)}")
+        
+        else:
+            try:
+                model_lifecycle.ensure_loaded(model_name)
+                response = http_client.post(
+                    f"{OLLAMA_API_BASE}/generate",
+                    json={
+                        "model": model_name,
+                        "prompt": prompt,
+                        "stream": True,
+                        "keep_alive": model_lifecycle.keep_alive(model_name),
+                        **({"context": context} if context else {}),
+                        "options": {
+                            "temperature": temperature,
+                            "num_predict": max_tokens,
+                            **({"stop": stop} if stop else {})
+                        }
+                    },
+                    timeout=(HTTP_CONNECT_TIMEOUT, REQUEST_TIMEOUT),
+                    stream=True
+                )
+                # Closing the response drops the connection if the client disconnects mid-stream
+                with response:
+                    if response.status_code != 200:
+                        raise Exception(f"Ollama API error: {response.status_code}")
+                    # Ollama streams one JSON object per line
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        part = json.loads(line)
+                        if part.get("error"):
+                            raise Exception(part["error"])
+                        if part.get("response"):
+                            yield part["response"]
+                        if part.get("done"):
+                            if result is not None:
+                                result["context"] = part.get("context")
+                            break
+            except Exception as e:
+                logger.error(f"Ollama API error: {str(e)}")
+                raise Exception(f"Ollama API error: {str(e)}")
+    
     def _init_ollama_client(self):
         """Initialize Ollama client for SQLCoder"""
         self.ollama_client = True  # Just a flag
@@ -153,6 +356,7 @@ class ConversationHandler:
     def __init__(self):
         self.conversations = {}  # Dictionary to store conversations by session ID
         self.max_history = 5     # Maximum number of messages to keep in history
+        self.context_stats = {"reused": 0, "rebuilt": 0}
         
     def create_or_reset_conversation(self, session_id, query=None, database_type="postgres"):
         """
@@ -167,6 +371,7 @@ class ConversationHandler:
             "query": query,
             "database_type": database_type,
             "history": [],
+            "model_context": None,  # Ollama context after the last answer: {"model", "tokens"}
             "last_updated": time.time()
         }
         
@@ -224,6 +429,51 @@ class ConversationHandler:
             return None
         return self.conversations[session_id]
         
+    def set_model_context(self, session_id, model_name, tokens):
+        """
+        Store the Ollama context returned with the latest answer, or clear it.
+        
+        Args:
+            session_id (str): Unique identifier for the conversation
+            model_name (str): Model that produced the context
+            tokens (list): Context token array, or None to clear it
+        """
+        if session_id not in self.conversations:
+            return
+        self.conversations[session_id]["model_context"] = (
+            {"model": model_name, "tokens": tokens} if tokens else None
+        )
+        
+    def get_model_context(self, session_id, model_name):
+        """
+        Get the stored Ollama context if it can be continued with model_name.
+        
+        Returns:
+            list: Context token array, or None if there is none, it came from
+            another model or it has grown past EXPLANATION_CONTEXT_MAX_TOKENS
+        """
+        context = self.conversations.get(session_id, {}).get("model_context")
+        if not context or context["model"] != model_name:
+            return None
+        if len(context["tokens"]) > EXPLANATION_CONTEXT_MAX_TOKENS:
+            # Rebuild from the trimmed history rather than overflow the context window
+            self.conversations[session_id]["model_context"] = None
+            return None
+        return context["tokens"]
+        
+    def record_context_use(self, reused):
+        self.context_stats["reused" if reused else "rebuilt"] += 1
+        
+    def get_followup_prompt(self, new_question):
+        """
+        Format a follow-up question to continue from a stored model context,
+        which already holds the query and the earlier turns.
+        """
+        prompt = f"\n\n### New Question\n{new_question}\n\n"
+        prompt += "### Response\n"
+        prompt += "Answer the follow-up question about the SQL query above."
+        return prompt
+        
     def get_prompt_with_history(self, session_id, new_question=None):
         """
         Format the conversation history into a prompt for the model.
@@ -291,9 +541,11 @@ conversation_handler = ConversationHandler()
 EXPLANATION_MODEL_NAME = os.environ.get("EXPLANATION_MODEL_NAME", "codellama:7b-instruct-q4_0")
 EXPLANATION_TEMPERATURE = float(os.environ.get("EXPLANATION_TEMPERATURE", 0.2))
 EXPLANATION_MAX_TOKENS = int(os.environ.get("EXPLANATION_MAX_TOKENS", 2048))
+# Stored follow-up contexts longer than this are dropped in favour of a rebuilt prompt
+EXPLANATION_CONTEXT_MAX_TOKENS = int(os.environ.get("EXPLANATION_CONTEXT_MAX_TOKENS", 3072))
 
 # SQL Explanation and Follow-up (CodeLlama-7B-instruct-q4_0)
-def explain_sql_query(session_id, query=None, database_type="postgres", question=None):
+def explain_sql_query(session_id, query=None, database_type="postgres", question=None, use_cache=True):
     """
     Generate an explanation for an SQL query or answer a follow-up question.
     
@@ -302,10 +554,39 @@ def explain_sql_query(session_id, query=None, database_type="postgres", question
         query (str): SQL query to explain (optional if in existing conversation)
         database_type (str): Type of database (postgres, mysql, trino)
         question (str): Follow-up question (optional)
+        use_cache (bool): Allow serving an identical earlier response
         
     Returns:
         str: Explanation or answer to follow-up question
     """
+    _start_explanation(session_id, query, database_type)
+    
+    # Generate explanation
+    response = "".join(_explanation_chunks(session_id, question, use_cache))
+    
+    _record_explanation(session_id, question, response)
+    
+    return response
+
+def stream_explain_sql_query(session_id, query=None, database_type="postgres", question=None, use_cache=True):
+    """
+    Streaming variant of explain_sql_query. The conversation is checked
+    immediately; the returned generator yields text chunks and records the
+    exchange in the conversation history once the stream completes.
+    """
+    _start_explanation(session_id, query, database_type)
+    
+    def generate():
+        chunks = []
+        for chunk in _explanation_chunks(session_id, question, use_cache):
+            chunks.append(chunk)
+            yield chunk
+        _record_explanation(session_id, question, "".join(chunks))
+    
+    return generate()
+
+def _start_explanation(session_id, query, database_type):
+    """Start or continue the conversation"""
     # If query is provided, reset conversation
     if query:
         conversation_handler.create_or_reset_conversation(session_id, query, database_type)
@@ -316,35 +597,84 @@ def explain_sql_query(session_id, query=None, database_type="postgres", question
         if not query:
             raise Exception("No active conversation found and no query provided")
         conversation_handler.create_or_reset_conversation(session_id, query, database_type)
-        
-    # Build prompt with conversation history
-    prompt = conversation_handler.get_prompt_with_history(session_id, question)
+
+def _explanation_chunks(session_id, question, use_cache):
+    """
+    Yield the explanation text. Follow-ups continue from the Ollama context of
+    the previous answer with just the new question; without a usable context
+    the full prompt with history is rebuilt.
+    """
+    result = {}
+    model_context = conversation_handler.get_model_context(session_id, EXPLANATION_MODEL_NAME) if question else None
     
-    # Generate explanation
-    response = model_handler.generate_response(
-        prompt,
-        EXPLANATION_MODEL_NAME,
-        max_tokens=EXPLANATION_MAX_TOKENS,
-        temperature=EXPLANATION_TEMPERATURE
-    )
+    if model_context:
+        chunks = model_handler.stream_response(
+            conversation_handler.get_followup_prompt(question),
+            EXPLANATION_MODEL_NAME,
+            max_tokens=EXPLANATION_MAX_TOKENS,
+            temperature=EXPLANATION_TEMPERATURE,
+            use_cache=use_cache,
+            priority=PRIORITY_INTERACTIVE,
+            context=model_context,
+            result=result
+        )
+        try:
+            first = next(chunks, None)
+        except SchedulerOverloaded:
+            raise
+        except Exception as e:
+            logger.warning(f"Follow-up with stored context failed, rebuilding the full prompt: {str(e)}")
+            model_context = None
+        else:
+            conversation_handler.record_context_use(reused=True)
+            if first is not None:
+                yield first
+            yield from chunks
     
-    # Add to conversation history
+    if not model_context:
+        if question:
+            conversation_handler.record_context_use(reused=False)
+        # Build prompt with conversation history
+        yield from model_handler.stream_response(
+            conversation_handler.get_prompt_with_history(session_id, question),
+            EXPLANATION_MODEL_NAME,
+            max_tokens=EXPLANATION_MAX_TOKENS,
+            temperature=EXPLANATION_TEMPERATURE,
+            use_cache=use_cache,
+            priority=PRIORITY_INTERACTIVE,
+            result=result
+        )
+    
+    # Cached responses and non-Ollama models return no context; the next follow-up rebuilds the prompt
+    conversation_handler.set_model_context(session_id, EXPLANATION_MODEL_NAME, result.get("context"))
+
+def _record_explanation(session_id, question, response):
+    """Add a completed question/answer exchange to the conversation history"""
     if question:
         conversation_handler.add_message(session_id, "user", question)
     conversation_handler.add_message(session_id, "assistant", response)
-    
-    return response
-
-
 
 
 # Schema Generation (Mistral-7B)
-def generate_schema(prompt):
+def generate_schema(prompt, use_cache=True):
     return model_handler.generate_response(
         prompt,
         SCHEMA_MODEL_NAME,  
         max_tokens=2048,
-        temperature=0.3
+        temperature=0.3,
+        use_cache=use_cache,
+        priority=PRIORITY_NORMAL
+    )
+
+
+def stream_schema(prompt, use_cache=True):
+    return model_handler.stream_response(
+        prompt,
+        SCHEMA_MODEL_NAME,
+        max_tokens=2048,
+        temperature=0.3,
+        use_cache=use_cache,
+        priority=PRIORITY_NORMAL
     )
 
 
@@ -352,46 +682,148 @@ def generate_schema(prompt):
 # In model_handler.py
 
 # Update the generate_query function to use Meta-Llama-3
-def generate_query(prompt):
+def generate_query(prompt, use_cache=True, schema_prefix=None, prefix_scope=None):
     """
     Generate SQL query using Meta-Llama-3 via Akash API
+    
+    Args:
+        prompt (str): The request; with schema_prefix, only the part specific to it
+        schema_prefix (str): Stable instructions, schema and function reference placed
+            first, primed once per prefix_scope so only the request is processed
+        prefix_scope (tuple): (dialect, schema fingerprint[, linked subset fingerprint]) the prefix belongs to
     """
     try:
-        # Generate the prompt with specific instructions
-        enhanced_prompt = (
-            f"You are a SQL expert. Generate a SQL query for the following request:\n\n"
-            f"{prompt}\n\n"
-            f"Important Instructions:\n"
-            f"1. Use the correct SQL dialect for the specified database type\n"
-            f"2. Include all necessary built-in functions\n"
-            f"3. Ensure proper syntax for the database type\n"
-            f"4. Return only the SQL query wrapped in ```sql ``` markers\n"
-        )
+        context = None
+        if schema_prefix is not None:
+            head = f"You are a SQL expert.\n\n{schema_prefix}"
+            context = _primed_query_prefix(head, prefix_scope)
+            # Without a primed context the same stable-first layout is sent in full
+            enhanced_prompt = prompt if context else head + prompt
+        else:
+            # Generate the prompt with specific instructions
+            enhanced_prompt = (
+                f"You are a SQL expert. Generate a SQL query for the following request:\n\n"
+                f"{prompt}\n\n"
+                f"Important Instructions:\n"
+                f"1. Use the correct SQL dialect for the specified database type\n"
+                f"2. Include all necessary built-in functions\n"
+                f"3. Ensure proper syntax for the database type\n"
+                f"4. Return only the SQL query wrapped in ```sql ``` markers\n"
+            )
         
+        # Stop as soon as the SQL is complete instead of waiting for the
+        # model to finish any explanation that follows it
         response = model_handler.generate_response(
             enhanced_prompt,
             QUERY_MODEL_NAME,  # Using Meta-Llama-3
             max_tokens=1024,
-            temperature=0.1
+            temperature=0.1,
+            use_cache=use_cache,
+            priority=PRIORITY_INTERACTIVE,
+            stop=SQL_STOP_SEQUENCES,
+            stop_when=complete_sql,
+            context=context
         )
         
         # Extract SQL from the response
-        sql_query = extract_sql_query(response)
+        sql_query = complete_sql(response) or extract_sql_query(response)
         return sql_query
         
     except Exception as e:
         logger.error(f"Error generating query: {str(e)}")
         raise
 
+def _primed_query_prefix(prefix, scope):
+    """Ollama context of the primed query prefix, or None if priming is unavailable"""
+    if not PREFIX_CACHE_ENABLED or model_handler.backend_for(QUERY_MODEL_NAME) != "ollama":
+        return None
+    try:
+        return prefix_context_cache.get(
+            QUERY_MODEL_NAME,
+            scope,
+            prefix,
+            lambda: model_handler.prime_context(prefix, QUERY_MODEL_NAME, PRIORITY_INTERACTIVE)
+        )
+    except SchedulerOverloaded:
+        raise
+    except Exception as e:
+        logger.warning(f"Priming the query prefix failed, sending the full prompt: {str(e)}")
+        return None
+
 # General Text Generation (Mistral-7B)
-def generate_text(prompt):
+def generate_text(prompt, use_cache=True):
     return model_handler.generate_response(
         prompt,
         SCHEMA_MODEL_NAME,
         max_tokens=MAX_TOKENS,
-        temperature=TEMPERATURE
+        temperature=TEMPERATURE,
+        use_cache=use_cache,
+        priority=PRIORITY_BATCH
+    )
+
+def stream_text(prompt, use_cache=True):
+    return model_handler.stream_response(
+        prompt,
+        SCHEMA_MODEL_NAME,
+        max_tokens=MAX_TOKENS,
+        temperature=TEMPERATURE,
+        use_cache=use_cache,
+        priority=PRIORITY_BATCH
     )
 
+# A closing fence followed by a blank line is where models start explaining the query;
+# the opening fence carries a language tag, so it never matches
+SQL_STOP_SEQUENCES = ["```\n\n"]
+
+SQL_FENCE_OPEN = re.compile(r'```[A-Za-z]*[ \t]*\n')
+SQL_STATEMENT_START = re.compile(r'\b(SELECT|INSERT|UPDATE|DELETE|CREATE|ALTER|DROP|WITH)\b', re.IGNORECASE)
+
+def complete_sql(response_text):
+    """
+    Return the SQL statement once a partial response contains a complete one:
+    the code block has closed, or a semicolon outside quotes and comments
+    ends the statement. Returns None while the statement is still incomplete.
+    """
+    fence = SQL_FENCE_OPEN.search(response_text)
+    if fence:
+        body = response_text[fence.end():]
+    elif '`' in response_text:
+        # A code block may still be opening
+        return None
+    else:
+        start = SQL_STATEMENT_START.search(response_text)
+        if not start:
+            return None
+        body = response_text[start.start():]
+    
+    end = _statement_end(body, fenced=bool(fence))
+    if end is None:
+        return None
+    return body[:end].strip() or None
+
+def _statement_end(sql, fenced):
+    """Index just past the terminating semicolon, or of the closing fence, else None."""
+    quote = None
+    i = 0
+    while i < len(sql):
+        char = sql[i]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif sql.startswith('--', i):
+            newline = sql.find('\n', i)
+            if newline == -1:
+                return None
+            i = newline
+        elif char == ';':
+            return i + 1
+        elif fenced and sql.startswith('```', i):
+            return i
+        i += 1
+    return None
+
 def extract_sql_query(response_text):
     """
     Extract SQL query from the model's response text.
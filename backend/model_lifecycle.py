@@ -0,0 +1,255 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from logging_config import setup_logger
+from http_client import http_client, HTTP_CONNECT_TIMEOUT
+from model_registry import model_registry, OLLAMA_API_BASE
+from single_flight import SingleFlight
+
+# Setup logger
+logger = setup_logger('model_lifecycle')
+
+
+def parse_keep_alive(value):
+    """
+    Ollama reads a string keep_alive as a Go duration ("5m", "24h"), which
+    needs a unit; bare numbers must be sent as JSON numbers (seconds).
+    """
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() else number
+
+
+# Configuration from environment variables
+MODEL_PRELOAD = os.environ.get("MODEL_PRELOAD", "true").lower() == "true"
+# Ollama keep_alive for pinned (hot) models; a negative value keeps them loaded indefinitely
+MODEL_PIN_KEEP_ALIVE = parse_keep_alive(os.environ.get("MODEL_PIN_KEEP_ALIVE", "-1"))
+MODEL_KEEP_ALIVE = parse_keep_alive(os.environ.get("MODEL_KEEP_ALIVE", "5m"))
+# Memory models may occupy; 0 derives it from the registry's available memory
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("MODEL_MEMORY_BUDGET_MB", 0))
+MODEL_MEMORY_HEADROOM_MB = int(os.environ.get("MODEL_MEMORY_HEADROOM_MB", 512))
+MODEL_LOAD_TIMEOUT = float(os.environ.get("MODEL_LOAD_TIMEOUT", 300))
+
+WARMUP_PROMPT = "SELECT 1;"
+# Latency samples kept per model
+LATENCY_SAMPLES = 20
+
+
+def same_model(configured, ollama_name):
+    """Ollama reports "name:tag"; configured names may omit the tag."""
+    return ollama_name == configured or ollama_name.startswith(f"{configured}:") or (
+        ":" not in configured and ollama_name == f"{configured}:latest"
+    )
+
+
+class ModelLifecycle:
+    """
+    Tracks which Ollama models are resident. Hot models are preloaded with a
+    warm-up prompt and pinned with keep_alive; other models are loaded on
+    first use (a cold start) and evicted least recently used first when the
+    memory budget would be exceeded.
+    """
+
+    def __init__(self):
+        self.current_model = None
+        self._pinned = set()
+        self._resident = OrderedDict()  # model -> {"size_mb", "loaded_at"}, least recently used first
+        self._stats = {}                # model -> load/cold-start counters and latencies
+        self._loads = SingleFlight("model load")
+        self._lock = threading.Lock()
+
+    def preload(self, model_names):
+        """Pin and load the hot models, one after another."""
+        for model_name in model_names:
+            if not model_name:
+                continue
+            with self._lock:
+                self._pinned.add(model_name)
+            try:
+                self.load(model_name)
+            except Exception as e:
+                logger.error(f"Failed to preload {model_name}: {str(e)}")
+
+    def keep_alive(self, model_name):
+        """keep_alive to send with every request, since Ollama resets it per request."""
+        return MODEL_PIN_KEEP_ALIVE if self._is_pinned(model_name) else MODEL_KEEP_ALIVE
+
+    def ensure_loaded(self, model_name):
+        """Mark a model as used, loading it first (a cold start) if it is not resident."""
+        self._reconcile()
+        with self._lock:
+            resident_name = self._resident_name(model_name)
+            if resident_name:
+                self._resident.move_to_end(resident_name)
+                self.current_model = model_name
+                return
+        elapsed = self._loads.do(model_name, lambda: self.load(model_name))
+        with self._lock:
+            stats = self._model_stats(model_name)
+            stats["cold_starts"] += 1
+            stats["cold_start_seconds"].append(elapsed)
+
+    def load(self, model_name):
+        """Load a model with a warm-up prompt after making room for it; returns the load time in seconds."""
+        self._make_room(model_name)
+
+        start = time.time()
+        response = http_client.post(
+            f"{OLLAMA_API_BASE}/generate",
+            json={
+                "model": model_name,
+                "prompt": WARMUP_PROMPT,
+                "stream": False,
+                "keep_alive": self.keep_alive(model_name),
+                "options": {"num_predict": 1}
+            },
+            timeout=(HTTP_CONNECT_TIMEOUT, MODEL_LOAD_TIMEOUT)
+        )
+        if response.status_code != 200:
+            raise Exception(f"Ollama API error while loading {model_name}: {response.status_code}")
+        elapsed = time.time() - start
+        # Ollama reports the time spent loading weights separately from the warm-up generation
+        load_duration = response.json().get("load_duration", 0) / 1e9
+
+        registry = model_registry.refresh()
+        size_mb = next(
+            (info["size_mb"] for name, info in registry["loaded_models"].items() if same_model(model_name, name)),
+            self._estimated_size(model_name)
+        )
+        with self._lock:
+            self._resident.pop(self._resident_name(model_name), None)
+            self._resident[model_name] = {"size_mb": size_mb, "loaded_at": time.time()}
+            self._resident.move_to_end(model_name)
+            self.current_model = model_name
+            stats = self._model_stats(model_name)
+            stats["loads"] += 1
+            stats["load_seconds"].append(elapsed)
+            stats["ollama_load_seconds"] = round(load_duration, 3)
+
+        logger.info(f"Loaded {model_name} ({size_mb} MB) in {elapsed:.2f}s")
+        return elapsed
+
+    def unload(self, model_name):
+        """Ask Ollama to release a model immediately."""
+        response = http_client.post(
+            f"{OLLAMA_API_BASE}/generate",
+            json={"model": model_name, "keep_alive": 0},
+            timeout=(HTTP_CONNECT_TIMEOUT, MODEL_LOAD_TIMEOUT),
+            idempotent=True
+        )
+        if response.status_code != 200:
+            raise Exception(f"Ollama API error while unloading {model_name}: {response.status_code}")
+        with self._lock:
+            self._resident.pop(self._resident_name(model_name), None)
+            self._pinned.discard(model_name)
+            if self.current_model == model_name:
+                self.current_model = next(reversed(self._resident), None)
+        model_registry.refresh()
+        logger.info(f"Unloaded {model_name}")
+
+    def stats(self):
+        """Resident models in LRU order, the memory budget, and load and cold-start latencies."""
+        with self._lock:
+            return {
+                "current_model": self.current_model,
+                "pinned": sorted(self._pinned),
+                "resident": [
+                    {"model": name, "size_mb": info["size_mb"], "pinned": self._is_pinned(name)}
+                    for name, info in self._resident.items()
+                ],
+                "memory_budget_mb": self._budget(),
+                "load_coalescing": self._loads.stats(),
+                "models": {
+                    name: {
+                        "loads": stats["loads"],
+                        "cold_starts": stats["cold_starts"],
+                        "evictions": stats["evictions"],
+                        "ollama_load_seconds": stats["ollama_load_seconds"],
+                        "load_seconds": _summary(stats["load_seconds"]),
+                        "cold_start_seconds": _summary(stats["cold_start_seconds"])
+                    }
+                    for name, stats in self._stats.items()
+                }
+            }
+
+    def _make_room(self, model_name):
+        """Evict unpinned models, least recently used first, until model_name fits the budget."""
+        needed = self._estimated_size(model_name)
+        while True:
+            with self._lock:
+                used = sum(info["size_mb"] for name, info in self._resident.items() if not same_model(model_name, name))
+                if used + needed <= self._budget():
+                    return
+                victim = next(
+                    (name for name in self._resident if not self._is_pinned(name) and not same_model(model_name, name)),
+                    None
+                )
+            if victim is None:
+                logger.warning(f"{model_name} needs {needed} MB but only pinned models can be evicted")
+                return
+            logger.info(f"Evicting {victim} to make room for {model_name}")
+            self.unload(victim)
+            with self._lock:
+                self._model_stats(victim)["evictions"] += 1
+
+    def _reconcile(self):
+        """
+        Sync with the latest registry snapshot: forget models Ollama unloaded on
+        its own (keep_alive expiry) and adopt models it already has loaded.
+        """
+        registry = model_registry.snapshot()
+        if not registry["ollama_reachable"] or not registry["refreshed_at"]:
+            return
+        loaded = registry["loaded_models"]
+        with self._lock:
+            for name, info in list(self._resident.items()):
+                if info["loaded_at"] < registry["refreshed_at"] and not any(same_model(name, l) for l in loaded):
+                    del self._resident[name]
+            for loaded_name, info in loaded.items():
+                if not any(same_model(name, loaded_name) for name in self._resident):
+                    self._resident[loaded_name] = {"size_mb": info["size_mb"], "loaded_at": registry["refreshed_at"]}
+                    self._resident.move_to_end(loaded_name, last=False)
+
+    def _resident_name(self, model_name):
+        return next((name for name in self._resident if same_model(model_name, name)), None)
+
+    def _is_pinned(self, name):
+        return any(same_model(pinned, name) for pinned in self._pinned)
+
+    def _budget(self):
+        if MODEL_MEMORY_BUDGET_MB:
+            return MODEL_MEMORY_BUDGET_MB
+        # Free memory already excludes resident models, so add them back
+        resident = sum(info["size_mb"] for info in self._resident.values())
+        return model_registry.snapshot()["available_memory_mb"] + resident - MODEL_MEMORY_HEADROOM_MB
+
+    def _estimated_size(self, model_name):
+        sizes = model_registry.snapshot()["model_sizes_mb"]
+        return next((size for name, size in sizes.items() if same_model(model_name, name)), 0)
+
+    def _model_stats(self, model_name):
+        return self._stats.setdefault(model_name, {
+            "loads": 0,
+            "cold_starts": 0,
+            "evictions": 0,
+            "ollama_load_seconds": None,
+            "load_seconds": deque(maxlen=LATENCY_SAMPLES),
+            "cold_start_seconds": deque(maxlen=LATENCY_SAMPLES)
+        })
+
+
+def _summary(samples):
+    if not samples:
+        return {"last": None, "avg": None, "max": None}
+    return {
+        "last": round(samples[-1], 3),
+        "avg": round(sum(samples) / len(samples), 3),
+        "max": round(max(samples), 3)
+    }
+
+
+# Initialize a global instance of ModelLifecycle
+model_lifecycle = ModelLifecycle()
@@ -0,0 +1,156 @@
+import os
+import time
+import subprocess
+import threading
+import psutil
+from logging_config import setup_logger
+from http_client import http_client
+
+# Setup logger
+logger = setup_logger('model_registry')
+
+# Configuration from environment variables
+OLLAMA_API_BASE = os.environ.get("OLLAMA_API_BASE", "http://localhost:11434/api")
+MODEL_REGISTRY_REFRESH_SECONDS = float(os.environ.get("MODEL_REGISTRY_REFRESH_SECONDS", 10))
+# Readiness fails once the registry has not refreshed for this long
+MODEL_REGISTRY_MAX_AGE_SECONDS = float(os.environ.get("MODEL_REGISTRY_MAX_AGE_SECONDS", 30))
+# Probes must answer quickly; a hung Ollama or driver only marks the registry stale
+PROBE_CONNECT_TIMEOUT = float(os.environ.get("PROBE_CONNECT_TIMEOUT", 1))
+PROBE_READ_TIMEOUT = float(os.environ.get("PROBE_READ_TIMEOUT", 2))
+
+
+def probe_gpu():
+    """Free and total GPU memory in MB from nvidia-smi, or None if there is no usable GPU."""
+    try:
+        result = subprocess.run(
+            ['nvidia-smi', '--query-gpu=memory.free,memory.total', '--format=csv,nounits,noheader'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+            timeout=PROBE_READ_TIMEOUT
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    free, total = 0, 0
+    for line in result.stdout.strip().splitlines():
+        line_free, line_total = (int(value) for value in line.split(","))
+        free += line_free
+        total += line_total
+    return {"free_mb": free, "total_mb": total}
+
+
+class ModelRegistry:
+    """
+    Periodically probes Ollama (installed and loaded models), the GPU and
+    system memory from a daemon thread. Readers get the last snapshot, so
+    health and status endpoints never wait on a probe.
+    """
+
+    def __init__(self, refresh_interval=MODEL_REGISTRY_REFRESH_SECONDS):
+        self.refresh_interval = refresh_interval
+        self._snapshot = {
+            "ollama_reachable": False,
+            "installed_models": [],
+            "model_sizes_mb": {},
+            "loaded_models": {},
+            "gpu_available": False,
+            "gpu_memory": None,
+            "available_memory_mb": psutil.virtual_memory().available // (1024 * 1024),
+            "refreshed_at": None,
+            "last_error": None
+        }
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+
+    def snapshot(self):
+        """The latest probe results plus their age in seconds."""
+        self._ensure_refresher()
+        snapshot = self._snapshot
+        refreshed_at = snapshot["refreshed_at"]
+        return dict(snapshot, age_seconds=round(time.time() - refreshed_at, 1) if refreshed_at else None)
+
+    def is_model_installed(self, model_name):
+        return any(name.startswith(model_name) for name in self.snapshot()["installed_models"])
+
+    def readiness(self, required_models=()):
+        """Return (ready, reasons) from the cached snapshot."""
+        snapshot = self.snapshot()
+        reasons = []
+        if snapshot["age_seconds"] is None:
+            reasons.append("model registry has not refreshed yet")
+        elif snapshot["age_seconds"] > MODEL_REGISTRY_MAX_AGE_SECONDS:
+            reasons.append(f"model registry is stale ({snapshot['age_seconds']}s old)")
+        if not snapshot["ollama_reachable"]:
+            reasons.append("Ollama API is unreachable")
+        for model_name in required_models:
+            if model_name and not any(name.startswith(model_name) for name in snapshot["installed_models"]):
+                reasons.append(f"model {model_name} is not installed")
+        return not reasons, reasons
+
+    def refresh(self):
+        """Probe Ollama and local resources and publish a new snapshot."""
+        with self._refresh_lock:
+            snapshot = dict(self._snapshot)
+            errors = []
+            try:
+                response = http_client.get(
+                    f"{OLLAMA_API_BASE}/tags",
+                    timeout=(PROBE_CONNECT_TIMEOUT, PROBE_READ_TIMEOUT),
+                    retries=0
+                )
+                response.raise_for_status()
+                models = response.json().get("models", [])
+                snapshot["installed_models"] = [m.get("name", "") for m in models]
+                snapshot["model_sizes_mb"] = {m.get("name", ""): m.get("size", 0) // (1024 * 1024) for m in models}
+
+                response = http_client.get(
+                    f"{OLLAMA_API_BASE}/ps",
+                    timeout=(PROBE_CONNECT_TIMEOUT, PROBE_READ_TIMEOUT),
+                    retries=0
+                )
+                response.raise_for_status()
+                snapshot["loaded_models"] = {
+                    m.get("name", ""): {"size_mb": m.get("size", 0) // (1024 * 1024), "expires_at": m.get("expires_at")}
+                    for m in response.json().get("models", [])
+                }
+                snapshot["ollama_reachable"] = True
+            except Exception as e:
+                snapshot["ollama_reachable"] = False
+                errors.append(f"Ollama: {str(e)}")
+
+            gpu_memory = probe_gpu()
+            snapshot["gpu_available"] = gpu_memory is not None
+            snapshot["gpu_memory"] = gpu_memory
+            snapshot["available_memory_mb"] = (
+                gpu_memory["free_mb"] if gpu_memory else psutil.virtual_memory().available // (1024 * 1024)
+            )
+
+            snapshot["refreshed_at"] = time.time()
+            snapshot["last_error"] = "; ".join(errors) or None
+            if errors and not self._snapshot["last_error"]:
+                logger.warning(f"Model registry probe failed: {snapshot['last_error']}")
+            # Publish by swapping the reference so readers never see a partial update
+            self._snapshot = snapshot
+            return snapshot
+
+    def _ensure_refresher(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name="model-registry", daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Model registry refresh failed: {str(e)}")
+            time.sleep(self.refresh_interval)
+
+
+# Initialize a global instance of ModelRegistry
+model_registry = ModelRegistry()
@@ -0,0 +1,86 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from logging_config import setup_logger
+from single_flight import SingleFlight
+
+# Setup logger
+logger = setup_logger('prefix_cache')
+
+# Configuration from environment variables
+PREFIX_CACHE_ENABLED = os.environ.get("PREFIX_CACHE_ENABLED", "true").lower() == "true"
+PREFIX_CACHE_MAX_ENTRIES = int(os.environ.get("PREFIX_CACHE_MAX_ENTRIES", 64))
+PREFIX_CACHE_TTL_SECONDS = float(os.environ.get("PREFIX_CACHE_TTL_SECONDS", 3600))
+
+
+class PrefixContextCache:
+    """
+    Ollama contexts of primed prompt prefixes, keyed by model, scope (dialect,
+    schema fingerprint and linked subset) and a hash of the prefix text. Requests continue
+    from the stored context and send only their own suffix. Entries expire
+    after a TTL and are evicted least recently used first.
+    """
+
+    def __init__(self, max_entries=PREFIX_CACHE_MAX_ENTRIES, ttl=PREFIX_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> {"tokens", "primed_at", "prime_seconds"}
+        self._primes = SingleFlight("prefix priming")
+        self._lock = threading.Lock()
+        self._prime_time = 0.0
+        self._counters = {"hits": 0, "primes": 0, "evictions": 0, "expired": 0}
+
+    def get(self, model_name, scope, prefix, prime):
+        """
+        Return the context tokens for `prefix`, calling prime() to compute them
+        on a miss. Concurrent misses for the same prefix share one priming call.
+        """
+        prefix_hash = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        key = (model_name, scope, prefix_hash)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry["primed_at"] <= self.ttl:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry["tokens"]
+            if entry:
+                del self._entries[key]
+                self._counters["expired"] += 1
+
+        return self._primes.do(key, lambda: self._prime(key, prime))
+
+    def stats(self):
+        """Return entry count, hit/prime counters and the average priming time."""
+        with self._lock:
+            primes = self._counters["primes"]
+            return {
+                "enabled": PREFIX_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "avg_prime_seconds": round(self._prime_time / primes, 3) if primes else 0.0,
+                "prime_coalescing": self._primes.stats(),
+                **self._counters
+            }
+
+    def _prime(self, key, prime):
+        start = time.time()
+        tokens = prime()
+        elapsed = time.time() - start
+        if not tokens:
+            return None
+        logger.info(f"Primed prefix for {key[0]} ({len(tokens)} tokens) in {elapsed:.2f}s")
+        with self._lock:
+            self._entries[key] = {"tokens": tokens, "primed_at": time.time(), "prime_seconds": elapsed}
+            self._entries.move_to_end(key)
+            self._counters["primes"] += 1
+            self._prime_time += elapsed
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+        return tokens
+
+
+# Initialize a global instance of PrefixContextCache
+prefix_context_cache = PrefixContextCache()
@@ -0,0 +1,192 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from logging_config import setup_logger
+
+# Setup logger
+logger = setup_logger('response_cache')
+
+# Configuration from environment variables
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", 24 * 3600))
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", 512))
+LLM_CACHE_DISK_ENTRIES = int(os.environ.get("LLM_CACHE_DISK_ENTRIES", 10000))
+# Anchored on this module rather than the working directory so every launch shares one cache
+LLM_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+LLM_CACHE_DB_PATH = os.environ.get("LLM_CACHE_DB_PATH", os.path.join(LLM_CACHE_DIR, "llm_responses.db"))
+# Sampling at higher temperatures is meant to vary, so those responses are not reused
+LLM_CACHE_MAX_TEMPERATURE = float(os.environ.get("LLM_CACHE_MAX_TEMPERATURE", 0.5))
+
+# Disk pruning runs after this many stores
+PRUNE_EVERY_STORES = 100
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def cache_key(model_name, prompt, temperature, max_tokens, context=None):
+    """
+    Cache key for a generation: (model, normalized prompt hash, temperature, max_tokens),
+    plus a hash of the Ollama context the prompt continues from, if any.
+    """
+    prompt_hash = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    raw = f"{model_name}\0{prompt_hash}\0{float(temperature)}\0{int(max_tokens)}"
+    if context:
+        raw += "\0" + hashlib.sha256(",".join(map(str, context)).encode("utf-8")).hexdigest()
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM responses: an in-memory LRU in front of a SQLite
+    table that survives restarts. Both tiers expire entries after a TTL.
+    """
+
+    def __init__(self, db_path=LLM_CACHE_DB_PATH, ttl=LLM_CACHE_TTL_SECONDS,
+                 memory_entries=LLM_CACHE_MEMORY_ENTRIES, disk_entries=LLM_CACHE_DISK_ENTRIES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._memory = OrderedDict()  # key -> (response, created_at)
+        self._lock = threading.Lock()
+        self._db = None
+        self._stores = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "bypassed": 0}
+
+    def is_cacheable(self, temperature):
+        return LLM_CACHE_ENABLED and temperature <= LLM_CACHE_MAX_TEMPERATURE
+
+    def get(self, key):
+        """Return a cached response or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return entry[0]
+            if entry:
+                del self._memory[key]
+
+            row = None
+            db = self._connection()
+            if db is not None:
+                try:
+                    row = db.execute(
+                        "SELECT response, created_at FROM responses WHERE key = ? AND created_at >= ?",
+                        (key, now - self.ttl)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Response cache read failed: {str(e)}")
+
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+
+            self._counters["disk_hits"] += 1
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def put(self, key, model_name, response):
+        """Store a response in both tiers."""
+        if not response:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            self._counters["stores"] += 1
+            db = self._connection()
+            if db is None:
+                return
+            try:
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, created_at) VALUES (?, ?, ?, ?)",
+                    (key, model_name, response, now)
+                )
+                db.commit()
+                self._stores += 1
+                if self._stores % PRUNE_EVERY_STORES == 0:
+                    self._prune(db, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache write failed: {str(e)}")
+
+    def record_bypass(self):
+        with self._lock:
+            self._counters["bypassed"] += 1
+
+    def clear(self):
+        """Drop every cached response from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM responses")
+                db.commit()
+
+    def stats(self):
+        """Return tier sizes, hit/miss counters and the overall hit rate."""
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            disk_entries = None
+            db = self._connection()
+            if db is not None:
+                disk_entries = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "enabled": LLM_CACHE_ENABLED,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                **self._counters
+            }
+
+    def _remember(self, key, response, created_at):
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _connection(self):
+        """Open the SQLite tier lazily; the cache degrades to memory-only if that fails."""
+        if self._db is None and self.db_path:
+            try:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                db = sqlite3.connect(self.db_path, check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("""
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        model TEXT,
+                        response TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                db.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+                db.commit()
+                self._db = db
+            except sqlite3.Error as e:
+                logger.error(f"Response cache disk tier unavailable: {str(e)}")
+                self.db_path = None
+        return self._db
+
+    def _prune(self, db, now):
+        db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        db.execute(
+            "DELETE FROM responses WHERE key NOT IN "
+            "(SELECT key FROM responses ORDER BY created_at DESC LIMIT ?)",
+            (self.disk_entries,)
+        )
+        db.commit()
+
+
+# Initialize a global instance of ResponseCache
+response_cache = ResponseCache()
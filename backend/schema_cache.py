@@ -0,0 +1,187 @@
+import os
+import time
+import threading
+from logging_config import setup_logger
+from http_client import http_client
+
+# Setup logger
+logger = setup_logger('schema_cache')
+
+# Configuration from environment variables
+SECONDARY_SERVICE_URL = os.environ.get("SECONDARY_SERVICE_URL", "http://localhost:5002")
+# How often the background thread re-validates the snapshot
+SCHEMA_REFRESH_SECONDS = float(os.environ.get("SCHEMA_REFRESH_SECONDS", 15))
+# Snapshots older than this (e.g. refresher failing) are refreshed inline
+SCHEMA_MAX_STALE_SECONDS = float(os.environ.get("SCHEMA_MAX_STALE_SECONDS", 120))
+# The DB service can switch databases at any time; its connection is re-checked inline after this
+SCHEMA_IDENTITY_TTL_SECONDS = float(os.environ.get("SCHEMA_IDENTITY_TTL_SECONDS", 2))
+SCHEMA_CONNECT_TIMEOUT = float(os.environ.get("SCHEMA_CONNECT_TIMEOUT", 2))
+SCHEMA_READ_TIMEOUT = float(os.environ.get("SCHEMA_READ_TIMEOUT", 30))
+
+
+def connection_identity(status):
+    """Identity of the database the DB service is connected to."""
+    return (
+        status.get("dbType", ""),
+        status.get("host", ""),
+        status.get("user", ""),
+        status.get("database", "")
+    )
+
+
+class SchemaSnapshotCache:
+    """
+    Keeps the DB service's schema per connection identity, versioned by the
+    ETag of /get-full-schema. A daemon thread re-validates it with conditional
+    requests. Readers only confirm the connection identity through the cheap
+    /connection-status call once it is older than SCHEMA_IDENTITY_TTL_SECONDS,
+    and fetch the schema inline only when the database has changed.
+    """
+
+    def __init__(self, base_url=SECONDARY_SERVICE_URL, refresh_interval=SCHEMA_REFRESH_SECONDS):
+        self.base_url = base_url
+        self.refresh_interval = refresh_interval
+        self._snapshots = {}     # identity -> snapshot dict
+        self._identity = None    # identity of the current connection, None if disconnected
+        self._checked_at = 0.0   # last successful refresh
+        self._attempted_at = 0.0  # last refresh attempt
+        self._identity_at = 0.0  # last identity check attempt
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._counters = {
+            "hits": 0, "misses": 0, "refreshes": 0, "not_modified": 0, "errors": 0, "identity_changes": 0
+        }
+
+    def get(self):
+        """
+        Return the current snapshot ({"tables", "db_type", "etag", "identity"})
+        or None when the DB service is not connected or unreachable.
+        """
+        self._ensure_refresher()
+
+        now = time.time()
+        # While the DB service is unreachable, retry inline at most once per refresh interval
+        if now - self._checked_at > SCHEMA_MAX_STALE_SECONDS and now - self._attempted_at > self.refresh_interval:
+            with self._lock:
+                self._counters["misses"] += 1
+            self.refresh()
+        elif now - self._identity_at > SCHEMA_IDENTITY_TTL_SECONDS:
+            self._confirm_identity()
+        else:
+            with self._lock:
+                self._counters["hits"] += 1
+
+        with self._lock:
+            return self._snapshots.get(self._identity) if self._identity else None
+
+    def refresh(self):
+        """Re-check the connection and revalidate its schema with If-None-Match."""
+        # Concurrent callers wait for one refresh instead of issuing their own
+        with self._refresh_lock:
+            self._attempted_at = time.time()
+            try:
+                status = self._connection_status()
+                self._refresh_locked(status)
+            except Exception as e:
+                with self._lock:
+                    self._counters["errors"] += 1
+                logger.warning(f"Schema refresh failed: {str(e)}")
+
+    def _confirm_identity(self):
+        """Check which database the DB service is connected to, refreshing inline if it changed."""
+        with self._refresh_lock:
+            # Another reader may have confirmed it while this one waited
+            if time.time() - self._identity_at <= SCHEMA_IDENTITY_TTL_SECONDS:
+                return
+            self._identity_at = time.time()
+            try:
+                status = self._connection_status()
+                identity = connection_identity(status) if status.get("is_connected") else None
+                with self._lock:
+                    unchanged = identity == self._identity and (identity is None or identity in self._snapshots)
+                    self._counters["hits" if unchanged else "identity_changes"] += 1
+                if not unchanged:
+                    logger.info(f"DB service connection changed to {identity}, refreshing schema")
+                    self._attempted_at = time.time()
+                    self._refresh_locked(status)
+            except Exception as e:
+                with self._lock:
+                    self._counters["errors"] += 1
+                logger.warning(f"Connection identity check failed: {str(e)}")
+
+    def _connection_status(self):
+        status_resp = http_client.get(
+            f"{self.base_url}/connection-status",
+            timeout=(SCHEMA_CONNECT_TIMEOUT, SCHEMA_READ_TIMEOUT)
+        )
+        status_resp.raise_for_status()
+        return status_resp.json()
+
+    def _refresh_locked(self, status):
+        """Revalidate the schema of the connection described by `status`; the refresh lock is held."""
+        if not status.get("is_connected"):
+            with self._lock:
+                self._identity = None
+                self._checked_at = self._identity_at = time.time()
+            return
+
+        identity = connection_identity(status)
+        with self._lock:
+            snapshot = self._snapshots.get(identity)
+
+        headers = {"If-None-Match": snapshot["etag"]} if snapshot and snapshot["etag"] else {}
+        schema_resp = http_client.get(
+            f"{self.base_url}/get-full-schema",
+            headers=headers,
+            timeout=(SCHEMA_CONNECT_TIMEOUT, SCHEMA_READ_TIMEOUT)
+        )
+
+        if schema_resp.status_code == 304:
+            with self._lock:
+                self._counters["not_modified"] += 1
+        else:
+            schema_resp.raise_for_status()
+            snapshot = {
+                "tables": schema_resp.json().get("tables", []),
+                "db_type": status.get("dbType", ""),
+                "etag": schema_resp.headers.get("ETag"),
+                "identity": identity,
+                "fetched_at": time.time()
+            }
+            logger.info(f"Refreshed schema snapshot with {len(snapshot['tables'])} tables")
+            with self._lock:
+                self._counters["refreshes"] += 1
+
+        with self._lock:
+            self._snapshots[identity] = snapshot
+            self._identity = identity
+            self._checked_at = self._identity_at = time.time()
+
+    def stats(self):
+        """Return snapshot count, age and hit/miss counters."""
+        with self._lock:
+            return {
+                "snapshots": len(self._snapshots),
+                "connected": self._identity is not None,
+                "age_seconds": round(time.time() - self._checked_at, 1) if self._checked_at else None,
+                **self._counters
+            }
+
+    def _ensure_refresher(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name="schema-refresher", daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            self.refresh()
+
+
+# Initialize a global instance of SchemaSnapshotCache
+schema_snapshot_cache = SchemaSnapshotCache()
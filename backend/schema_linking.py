@@ -0,0 +1,207 @@
+import os
+import re
+import json
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+from logging_config import setup_logger
+from schema_prompt import SCHEMA_TOKEN_BUDGET, table_cost
+
+# Setup logger
+logger = setup_logger('schema_linking')
+
+# Configuration from environment variables
+SCHEMA_LINK_TOP_K = int(os.environ.get("SCHEMA_LINK_TOP_K", 8))
+SCHEMA_INDEX_CACHE_SIZE = int(os.environ.get("SCHEMA_INDEX_CACHE_SIZE", 16))
+# Minimum trigram similarity for a fuzzy term match (e.g. "categorie" ~ "category")
+FUZZY_MATCH_THRESHOLD = float(os.environ.get("FUZZY_MATCH_THRESHOLD", 0.5))
+# Similarity credited when one term is a prefix of the other
+PREFIX_MATCH_SIMILARITY = 0.75
+
+# Weights of a matching term by where it appears
+TABLE_NAME_WEIGHT = 3.0
+COLUMN_NAME_WEIGHT = 1.0
+# Score share inherited by tables reachable over a foreign key
+FK_NEIGHBOUR_DECAY = 0.5
+
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "in", "on", "at", "to", "by", "with", "and", "or", "not",
+    "is", "are", "was", "were", "be", "been", "all", "any", "each", "every", "which", "who",
+    "whose", "what", "when", "where", "how", "many", "much", "that", "this", "these", "those",
+    "me", "my", "show", "list", "find", "get", "give", "return", "display", "select", "from",
+    "than", "more", "less", "most", "least", "their", "there", "have", "has", "had", "per",
+    "last", "first", "top", "number", "count", "total", "sql", "query", "table", "tables"
+}
+
+
+def singularize(word):
+    """Crude plural stripping so 'orders' matches 'order' and 'categories' matches 'category'."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("ses", "xes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def identifier_terms(name):
+    """Split snake_case / camelCase / digit-separated identifiers into normalized terms."""
+    words = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(name))
+    return [singularize(w) for w in re.split(r"[^A-Za-z0-9]+", words.lower()) if w and not w.isdigit()]
+
+
+def question_terms(text):
+    """Normalized content words of a natural-language question."""
+    return [
+        singularize(w) for w in re.findall(r"[a-z0-9]+", text.lower())
+        if w not in STOPWORDS and len(w) > 1 and not w.isdigit()
+    ]
+
+
+def trigrams(term):
+    padded = f"#{term}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def schema_fingerprint(tables):
+    """Stable hash of a schema, used to reuse its index across requests."""
+    body = json.dumps(tables, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class SchemaIndex:
+    """
+    Lexical index over one schema snapshot: weighted identifier terms per
+    table, their trigrams for fuzzy matching, and foreign key neighbours.
+    """
+
+    def __init__(self, tables):
+        self.tables = [t for t in tables if isinstance(t, dict) and t.get("name")]
+        self.by_name = {t["name"]: t for t in self.tables}
+        self.terms = {}       # table -> {term: weight}
+        self.neighbours = {}  # table -> set of FK-connected tables
+
+        for table in self.tables:
+            name = table["name"]
+            weights = {}
+            for term in identifier_terms(name):
+                weights[term] = max(weights.get(term, 0), TABLE_NAME_WEIGHT)
+            for column in table.get("columns", []):
+                for term in identifier_terms(column.get("name", "")):
+                    weights[term] = max(weights.get(term, 0), COLUMN_NAME_WEIGHT)
+            self.terms[name] = weights
+            self.neighbours.setdefault(name, set())
+
+            for column in table.get("columns", []):
+                fk = column.get("foreign_key")
+                if fk and fk.get("table") in self.by_name and fk["table"] != name:
+                    self.neighbours[name].add(fk["table"])
+                    self.neighbours.setdefault(fk["table"], set()).add(name)
+
+        # Rare terms identify a table better than ones shared by many (e.g. "id")
+        document_frequency = {}
+        for weights in self.terms.values():
+            for term in weights:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        count = max(len(self.tables), 1)
+        self.idf = {term: math.log(1 + count / df) for term, df in document_frequency.items()}
+        self.term_trigrams = {term: trigrams(term) for term in self.idf}
+
+    def score(self, question):
+        """Relevance score per table for a question; tables without matches are omitted."""
+        scores = {}
+        for q_term in set(question_terms(question)):
+            matches = self._match(q_term)
+            for table, weights in self.terms.items():
+                best = 0.0
+                for term, similarity in matches:
+                    if term in weights:
+                        best = max(best, weights[term] * self.idf[term] * similarity)
+                if best:
+                    scores[table] = scores.get(table, 0.0) + best
+        return scores
+
+    def select(self, question, top_k=SCHEMA_LINK_TOP_K, token_budget=SCHEMA_TOKEN_BUDGET, cost=table_cost):
+        """
+        Pick the top-k tables for a question plus their FK neighbours, in
+        relevance order, until the token budget is used up.
+        Falls back to schema order when nothing matches.
+        """
+        scores = self.score(question)
+        seeds = sorted(scores, key=lambda t: -scores[t])[:top_k]
+
+        ranked = {table: scores[table] for table in seeds}
+        for table in seeds:
+            for neighbour in self.neighbours.get(table, ()):
+                inherited = scores[table] * FK_NEIGHBOUR_DECAY
+                if ranked.get(neighbour, 0) < inherited:
+                    ranked[neighbour] = max(inherited, scores.get(neighbour, 0))
+
+        if ranked:
+            candidates = sorted(ranked, key=lambda t: -ranked[t])
+        else:
+            candidates = [t["name"] for t in self.tables]
+
+        selected = []
+        used = 0
+        for name in candidates:
+            table_tokens = cost(self.by_name[name])
+            if selected and used + table_tokens > token_budget:
+                continue
+            selected.append(self.by_name[name])
+            used += table_tokens
+        return selected
+
+    def _match(self, q_term):
+        """Schema terms matching a question term, with similarity in (0, 1]."""
+        if q_term in self.idf:
+            return [(q_term, 1.0)]
+        grams = trigrams(q_term)
+        matches = []
+        for term, term_grams in self.term_trigrams.items():
+            similarity = len(grams & term_grams) / len(grams | term_grams)
+            # Abbreviations such as "cust" rarely share enough trigrams with the full word
+            if min(len(q_term), len(term)) >= 4 and (term.startswith(q_term) or q_term.startswith(term)):
+                similarity = max(similarity, PREFIX_MATCH_SIMILARITY)
+            if similarity >= FUZZY_MATCH_THRESHOLD:
+                matches.append((term, similarity))
+        return matches
+
+
+class SchemaIndexCache:
+    """Keeps the indexes of recently used schema snapshots."""
+
+    def __init__(self, max_entries=SCHEMA_INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tables, fingerprint=None):
+        """Return the index for a schema, building it on first use."""
+        fingerprint = fingerprint or schema_fingerprint(tables)
+        with self._lock:
+            index = self._indexes.get(fingerprint)
+            if index is not None:
+                self._indexes.move_to_end(fingerprint)
+                return index
+
+        index = SchemaIndex(tables)
+        with self._lock:
+            self._indexes[fingerprint] = index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        logger.info(f"Built schema index for {len(index.tables)} tables")
+        return index
+
+
+# Initialize a global instance of SchemaIndexCache
+schema_index_cache = SchemaIndexCache()
+
+
+def link_schema(question, tables, top_k=SCHEMA_LINK_TOP_K, token_budget=SCHEMA_TOKEN_BUDGET, fingerprint=None):
+    """Return the subset of `tables` relevant to `question` that fits the token budget."""
+    if len(tables) <= top_k and sum(table_cost(t) for t in tables) <= token_budget:
+        return tables
+    return schema_index_cache.get(tables, fingerprint).select(question, top_k, token_budget)
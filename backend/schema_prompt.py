@@ -0,0 +1,135 @@
+import os
+import re
+import json
+from logging_config import setup_logger
+
+# Setup logger
+logger = setup_logger('schema_prompt')
+
+# Maximum tokens the schema section of a prompt may use
+SCHEMA_TOKEN_BUDGET = int(os.environ.get("SCHEMA_TOKEN_BUDGET", 3000))
+
+# Subword tokenizers split long identifiers; roughly four characters per token
+CHARS_PER_TOKEN = 4
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """Approximate LLM token count: one per punctuation mark, about four characters per word piece."""
+    return sum(max(1, -(-len(piece) // CHARS_PER_TOKEN)) for piece in TOKEN_PATTERN.findall(text))
+
+
+def _first(mapping, *keys, default=None):
+    for key in keys:
+        if mapping.get(key) is not None:
+            return mapping[key]
+    return default
+
+
+def normalize_column(column):
+    """Map the column shapes used across the app to name/data_type/primary_key/foreign_key."""
+    if isinstance(column, str):
+        return {"name": column, "data_type": "", "primary_key": False, "foreign_key": None}
+
+    foreign_key = _first(column, "foreign_key", "foreignKey", "references")
+    if isinstance(foreign_key, str):
+        # "customers.id" or "customers(id)"
+        table, _, ref_column = foreign_key.replace("(", ".").rstrip(")").partition(".")
+        foreign_key = {"table": table, "column": ref_column or "id"}
+
+    return {
+        "name": _first(column, "name", "column_name", "columnName", default=""),
+        "data_type": str(_first(column, "data_type", "dataType", "type", default="")),
+        "primary_key": bool(_first(column, "primary_key", "primaryKey", "isPrimaryKey", default=False)),
+        "foreign_key": foreign_key if isinstance(foreign_key, dict) else None
+    }
+
+
+def normalize_table(name, table):
+    columns = table.get("columns", table) if isinstance(table, dict) else table
+    if isinstance(columns, dict):
+        # {"column": "type"} mappings
+        columns = [{"name": col, "data_type": col_type} for col, col_type in columns.items()]
+    return {"name": name, "columns": [normalize_column(c) for c in columns or []]}
+
+
+def normalize_schema(schema):
+    """
+    Normalize a schema given as a list of tables, a {"tables": [...]} or
+    {"table": columns} dict, a single table, or a (JSON) string.
+
+    Returns:
+        list | str: table dicts, or the original text if it is not structured
+    """
+    if isinstance(schema, str):
+        text = schema.strip()
+        if not text:
+            return []
+        try:
+            return normalize_schema(json.loads(text))
+        except ValueError:
+            # Free-form text (e.g. DDL pasted by the user) is used as is
+            return text
+
+    if isinstance(schema, dict):
+        if isinstance(schema.get("tables"), list):
+            return normalize_schema(schema["tables"])
+        name = _first(schema, "name", "tableName", "table_name")
+        if name and "columns" in schema:
+            return [normalize_table(name, schema)]
+        return [normalize_table(name, table) for name, table in schema.items()]
+
+    if isinstance(schema, list):
+        return [
+            normalize_table(_first(table, "name", "tableName", "table_name", default=""), table)
+            for table in schema if isinstance(table, dict)
+        ]
+
+    return []
+
+
+def render_table(table):
+    """Render one table as compact pseudo-DDL, e.g. orders(id int PK, customer_id int FK->customers.id)."""
+    parts = []
+    for column in table.get("columns", []):
+        part = column["name"]
+        if column.get("data_type"):
+            part += f" {column['data_type'].lower()}"
+        if column.get("primary_key"):
+            part += " PK"
+        foreign_key = column.get("foreign_key")
+        if foreign_key:
+            part += f" FK->{foreign_key.get('table')}.{foreign_key.get('column')}"
+        parts.append(part)
+    return f"{table['name']}({', '.join(parts)})"
+
+
+def table_cost(table):
+    """Tokens one table occupies in the rendered schema."""
+    return estimate_tokens(render_table(table)) + 1
+
+
+def render_schema(schema, token_budget=SCHEMA_TOKEN_BUDGET):
+    """
+    Render a normalized schema for a prompt, stopping at the token budget.
+    Free-form text schemas are cut to the budget as well.
+    """
+    if isinstance(schema, str):
+        if estimate_tokens(schema) <= token_budget:
+            return schema
+        logger.warning(f"Schema text exceeds {token_budget} tokens, truncating")
+        return schema[:token_budget * CHARS_PER_TOKEN]
+
+    lines = []
+    used = 0
+    for table in schema:
+        line = render_table(table)
+        cost = estimate_tokens(line) + 1
+        if lines and used + cost > token_budget:
+            omitted = len(schema) - len(lines)
+            logger.warning(f"Schema exceeds {token_budget} tokens, omitting {omitted} tables")
+            lines.append(f"-- {omitted} more tables omitted")
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
@@ -0,0 +1,229 @@
+import os
+import re
+import time
+import zlib
+import random
+import threading
+from collections import OrderedDict
+from logging_config import setup_logger
+from schema_linking import singularize
+
+# Setup logger
+logger = setup_logger('semantic_cache')
+
+# Configuration from environment variables
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.85))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", 2000))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", 24 * 3600))
+
+# MinHash signature of NUM_PERMUTATIONS values, split into LSH bands of ROWS_PER_BAND
+NUM_PERMUTATIONS = 64
+ROWS_PER_BAND = 4
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Words that do not change which SQL answers a question
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "in", "on", "at", "to", "by", "with", "and", "is", "are",
+    "was", "were", "be", "me", "my", "our", "show", "list", "find", "get", "give", "return",
+    "display", "fetch", "what", "which", "who", "please", "all", "can", "you", "i", "want",
+    "need", "query", "sql", "write", "generate", "their", "that", "there"
+}
+
+# Interchangeable phrasings mapped to one canonical term; entity words are left alone
+# because they may name different tables in the schema
+SYNONYMS = {
+    "highest": "top", "largest": "top", "biggest": "top", "most": "top", "best": "top", "greatest": "top",
+    "lowest": "bottom", "smallest": "bottom", "least": "bottom", "fewest": "bottom", "worst": "bottom",
+    "number": "count", "many": "count",
+    "average": "avg", "mean": "avg",
+    "sum": "total"
+}
+
+# Terms whose presence flips the meaning; they must match exactly, like numbers
+NEGATIONS = {"not", "no", "never", "without", "except", "excluding", "exclude", "none"}
+
+# Directional terms and their synonyms; opposite directions ask for different SQL,
+# so the canonical term must also match exactly
+DIRECTIONS = {
+    "max": "max", "maximum": "max", "min": "min", "minimum": "min",
+    "asc": "asc", "ascending": "asc", "desc": "desc", "descending": "desc",
+    "first": "first", "earliest": "first", "last": "last", "latest": "last",
+    "top": "top", "bottom": "bottom",
+    "before": "before", "after": "after",
+    "greater": "greater", "more": "greater", "above": "greater",
+    "less": "less", "fewer": "less", "below": "less"
+}
+
+
+def normalize_question(question):
+    """
+    Reduce a question to canonical content terms.
+
+    Returns:
+        tuple: (terms, exact) - a set of terms, and the numbers, negations and
+        directions that must be identical for two questions to match
+    """
+    words = re.findall(r"[a-z0-9]+(?:\.[0-9]+)?", question.lower())
+    terms = set()
+    exact = []
+    for word in words:
+        if word[0].isdigit() or word in NEGATIONS:
+            exact.append(word)
+            continue
+        if word in DIRECTIONS:
+            exact.append(DIRECTIONS[word])
+            continue
+        if word in STOPWORDS:
+            continue
+        word = singularize(word)
+        word = SYNONYMS.get(word, word)
+        if word in DIRECTIONS:
+            exact.append(DIRECTIONS[word])
+        else:
+            terms.add(word)
+    return terms, tuple(sorted(exact))
+
+
+def shingles(terms):
+    """Whole terms plus character trigrams, so small typos still overlap."""
+    result = set(terms)
+    for term in terms:
+        padded = f"#{term}#"
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class MinHasher:
+    """MinHash signatures over string shingles using universal hash permutations."""
+
+    def __init__(self, num_permutations=NUM_PERMUTATIONS, seed=1):
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_permutations)
+        ]
+
+    def signature(self, items):
+        hashes = [zlib.crc32(item.encode("utf-8")) for item in items] or [0]
+        return tuple(
+            min((a * h + b) % MERSENNE_PRIME for h in hashes)
+            for a, b in self.permutations
+        )
+
+
+class SemanticQueryCache:
+    """
+    Maps natural-language questions to previously validated SQL. Questions
+    are indexed with MinHash LSH within a scope (schema fingerprint and
+    dialect); candidates are confirmed by exact Jaccard similarity.
+    """
+
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                 ttl=SEMANTIC_CACHE_TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hasher = MinHasher()
+        self._entries = OrderedDict()  # entry id -> entry dict, least recently used first
+        self._buckets = {}             # (scope, band, band values) -> set of entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def lookup(self, question, scope):
+        """
+        Return {"sql", "question", "similarity"} for the most similar cached
+        question in `scope` above the threshold, or None.
+        """
+        terms, exact = normalize_question(question)
+        question_shingles = shingles(terms)
+        signature = self.hasher.signature(question_shingles)
+        now = time.time()
+
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(scope, signature):
+                candidates |= self._buckets.get(band_key, set())
+
+            best = None
+            best_similarity = 0.0
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry["exact"] != exact or now - entry["created_at"] > self.ttl:
+                    continue
+                similarity = jaccard(question_shingles, entry["shingles"])
+                if similarity >= self.threshold and similarity > best_similarity:
+                    best, best_similarity = entry, similarity
+
+            if best is None:
+                self._counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end(best["id"])
+            self._counters["hits"] += 1
+            return {"sql": best["sql"], "question": best["question"], "similarity": round(best_similarity, 4)}
+
+    def store(self, question, scope, sql):
+        """Remember validated SQL for a question."""
+        terms, exact = normalize_question(question)
+        if not terms:
+            return
+        question_shingles = shingles(terms)
+        signature = self.hasher.signature(question_shingles)
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            band_keys = self._band_keys(scope, signature)
+            self._entries[entry_id] = {
+                "id": entry_id,
+                "question": question,
+                "sql": sql,
+                "exact": exact,
+                "shingles": question_shingles,
+                "band_keys": band_keys,
+                "created_at": time.time()
+            }
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(entry_id)
+            self._counters["stores"] += 1
+
+            while len(self._entries) > self.max_entries:
+                _, oldest = self._entries.popitem(last=False)
+                self._unindex(oldest)
+                self._counters["evictions"] += 1
+
+    def stats(self):
+        """Return entry count and hit/miss counters."""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "enabled": SEMANTIC_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                **self._counters
+            }
+
+    def _band_keys(self, scope, signature):
+        return [
+            (scope, band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])
+            for band in range(len(signature) // ROWS_PER_BAND)
+        ]
+
+    def _unindex(self, entry):
+        for band_key in entry["band_keys"]:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(entry["id"])
+                if not bucket:
+                    del self._buckets[band_key]
+
+
+# Initialize a global instance of SemanticQueryCache
+semantic_query_cache = SemanticQueryCache()
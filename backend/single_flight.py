@@ -0,0 +1,84 @@
+import time
+import threading
+from logging_config import setup_logger
+
+# Setup logger
+logger = setup_logger('single_flight')
+
+
+class _Call:
+    """One in-flight execution and the outcome shared with its waiters."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function, later callers block until it finishes and receive the same
+    result or exception. Nothing is kept once the call completes.
+    """
+
+    def __init__(self, name="generation"):
+        self.name = name
+        self._calls = {}  # key -> _Call
+        self._lock = threading.Lock()
+        self._wait_time = 0.0
+        self._counters = {"executions": 0, "coalesced": 0, "max_waiters": 0}
+
+    def do(self, key, fn):
+        """Run fn() unless an identical call is in flight, in which case wait for its outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._counters["executions"] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._counters["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            start = time.time()
+            call.done.wait()
+            with self._lock:
+                self._wait_time += time.time() - start
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.waiters:
+                    logger.info(f"Shared one {self.name} with {call.waiters} identical requests")
+                    self._counters["max_waiters"] = max(self._counters["max_waiters"], call.waiters)
+            call.done.set()
+
+    def stats(self):
+        """Return execution/coalesced counts, the coalescing ratio and the average follower wait."""
+        with self._lock:
+            coalesced = self._counters["coalesced"]
+            requests = self._counters["executions"] + coalesced
+            return {
+                "requests": requests,
+                "in_flight": len(self._calls),
+                "coalescing_ratio": round(coalesced / requests, 4) if requests else 0.0,
+                "avg_wait_ms": round(1000 * self._wait_time / coalesced, 1) if coalesced else 0.0,
+                **self._counters
+            }
+
+
+# Initialize a global instance of SingleFlight for LLM generations
+single_flight = SingleFlight("generation")
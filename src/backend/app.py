@@ -1,9 +1,4 @@
-from flask import Flask, request, jsonify
-import mysql.connector
-import psycopg2
-import pymongo
-import sqlite3
-import pymssql
+from flask import Flask, Response, request, jsonify
 import time
 from flask_cors import CORS
 import os
@@ -14,6 +9,21 @@ import requests
 
 # Import the proper synthetic data generator
 from gemini_service import generate_synthetic_data
+from connection_pool import pool_manager
+from result_stream import RowStream, ndjson_chunks, json_chunks
+from result_cursors import cursor_registry, CursorNotFoundError, CursorLimitError, parse_page_size
+from query_limits import resolve_budget, apply_row_limit, fetch_with_budget, InvalidBudgetError
+from result_stream import open_stream_cursor
+from query_registry import query_registry, resolve_timeout, QueryCancelledError, QueryTimeoutError, InvalidTimeoutError
+from query_jobs import job_manager, JobQueueFullError
+from result_cache import result_cache, write_tables, RESULT_CACHE_ENABLED
+from schema_introspection import introspect_schema, list_tables
+from schema_cache import schema_cache, is_schema_change
+from result_formats import (
+    RESULT_FORMATS, COMPRESS_MIN_BYTES, UnsupportedFormatError, negotiate_format,
+    describe_columns, build_payload, payload_chunks, encode_msgpack, encode_arrow,
+    negotiate_encoding, compress_body
+)
 
 app = Flask(__name__)
 CORS(app)  # Allow frontend to make requests to backend
@@ -24,10 +34,39 @@ try:
 except ImportError:
     pass  # dotenv module not installed, continue without it
 
+# Page sizes for /schema/tables
+SCHEMA_PAGE_SIZE = int(os.environ.get("SCHEMA_PAGE_SIZE", 100))
+SCHEMA_MAX_PAGE_SIZE = int(os.environ.get("SCHEMA_MAX_PAGE_SIZE", 1000))
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@app.after_request
+def compress_response(response):
+    """Compress sizeable buffered responses with gzip/deflate when the client accepts it."""
+    if (response.is_streamed or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or not 200 <= response.status_code < 300):
+        return response
+    
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+    if not encoding:
+        return response
+    
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    
+    response.set_data(compress_body(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    # The compressed bytes differ from the identity body, so they may not share a strong ETag
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
 # Store DB configuration globally 
 db_config = {
     "host": "localhost",
@@ -69,47 +108,24 @@ def connect_db():
         except ValueError:
             return jsonify({"error": "Port must be a number"}), 400
     
-    # Test the connection based on DB type
+    if db_type not in ["mysql", "mariadb", "postgresql", "postgres", "mongodb", "sqlite", "sqlserver"]:
+        return jsonify({"error": f"Unsupported database type: {db_type}"}), 400
+    
+    new_config = dict(connection_data_clean)
+    new_config["dbType"] = db_type  # Add DB type to config
+    
+    # Test the connection based on DB type (the pooled connection is kept warm)
     try:
-        conn = None
-        
-        if db_type == "mysql" or db_type == "mariadb":
-            conn = mysql.connector.connect(**connection_data_clean)
-        elif db_type == "postgresql" or db_type == "postgres":
-            conn = psycopg2.connect(**connection_data_clean)
-        elif db_type == "mongodb":
-            client = pymongo.MongoClient(
-                host=connection_data_clean.get("host", "localhost"),
-                port=connection_data_clean.get("port", 27017),
-                username=connection_data_clean.get("user"),
-                password=connection_data_clean.get("password")
-            )
+        if db_type == "mongodb":
             # Test connection by listing databases
-            client.list_database_names()
-            conn = client  # Just to indicate success
-        elif db_type == "sqlite":
-            # For SQLite, database is the path to the file
-            db_path = connection_data_clean.get("database", ":memory:")
-            conn = sqlite3.connect(db_path)
-        elif db_type == "sqlserver":
-            conn = pymssql.connect(
-                server=connection_data_clean.get("host"),
-                user=connection_data_clean.get("user"),
-                password=connection_data_clean.get("password"),
-                database=connection_data_clean.get("database")
-            )
+            pool_manager.mongo_client(new_config).list_database_names()
         else:
-            return jsonify({"error": f"Unsupported database type: {db_type}"}), 400
-        
-        # If we got here, connection succeeded
-        if conn and db_type != "mongodb":
-            conn.close()
-        elif conn:  # MongoDB case
-            conn.close()
+            with pool_manager.connection(new_config):
+                pass
             
-        # Store configuration globally
-        db_config = connection_data_clean
-        db_config["dbType"] = db_type  # Add DB type to config
+        # Store configuration globally and drop pools for older configurations
+        db_config = new_config
+        pool_manager.dispose_all(keep=db_config)
         is_connected = True
         
         return jsonify({
@@ -118,6 +134,7 @@ def connect_db():
             "is_connected": is_connected
         })
     except Exception as err:
+        pool_manager.dispose(new_config)
         is_connected = False
         return jsonify({"error": str(err)}), 500
 
@@ -134,6 +151,27 @@ def connection_status():
         "dbType": db_config.get("dbType", "mysql")
     })
 
+@app.route("/pool-stats", methods=["GET"])
+def pool_stats():
+    """API to inspect connection pool and open cursor usage."""
+    cursor_registry.sweep()
+    stats = pool_manager.stats()
+    stats["cursors"] = cursor_registry.stats()
+    return jsonify(stats)
+
+@app.route("/cache-stats", methods=["GET"])
+def cache_stats():
+    """API to inspect result and schema cache hit/miss counters."""
+    stats = result_cache.stats()
+    stats["schema"] = schema_cache.stats()
+    return jsonify(stats)
+
+@app.route("/cache/clear", methods=["POST"])
+def clear_cache():
+    """API to drop every cached query result."""
+    cleared = result_cache.clear()
+    return jsonify({"success": True, "message": f"Cleared {cleared} cached results"})
+
 
 @app.route('/get-full-schema', methods=['GET'])
 def get_full_schema():
@@ -147,166 +185,113 @@ def get_full_schema():
         start_time = time.time()
         schema = {"tables": []}
         db_type = db_config["dbType"].lower()
+        snapshot = None
+        from_cache = False
 
-        # MySQL/MariaDB implementation
-        if db_type in ["mysql", "mariadb"]:
-            conn = mysql.connector.connect(**{k: v for k, v in db_config.items() if k != "dbType"})
-            cursor = conn.cursor(dictionary=True)
-            
-            # Get tables
-            cursor.execute("SHOW TABLES")
-            tables = [table[0] for table in cursor.fetchall()]
-            
-            for table in tables:
-                # Get columns
-                cursor.execute(f"SHOW FULL COLUMNS FROM `{table}`")
-                columns = cursor.fetchall()
-                
-                # Get constraints
-                cursor.execute(f"""
-                    SELECT 
-                        COLUMN_NAME,
-                        REFERENCED_TABLE_NAME,
-                        REFERENCED_COLUMN_NAME
-                    FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
-                    WHERE TABLE_SCHEMA = DATABASE() 
-                    AND TABLE_NAME = '{table}'
-                    AND REFERENCED_TABLE_NAME IS NOT NULL
-                """)
-                foreign_keys = cursor.fetchall()
-                
-                table_schema = {
-                    "name": table,
-                    "columns": [
-                        {
-                            "name": col["Field"],
-                            "data_type": col["Type"],
-                            "nullable": col["Null"] == "YES",
-                            "primary_key": col["Key"] == "PRI",
-                            "foreign_key": next((
-                                {"table": fk[1], "column": fk[2]} 
-                                for fk in foreign_keys 
-                                if fk[0] == col["Field"]
-                            ), None),
-                            "default": col["Default"]
-                        } for col in columns
-                    ]
-                }
-                schema["tables"].append(table_schema)
-            cursor.close()
-            conn.close()
-
-        # PostgreSQL implementation
-        elif db_type in ["postgres", "postgresql"]:
-            conn = psycopg2.connect(**{k: v for k, v in db_config.items() if k != "dbType"})
-            cursor = conn.cursor()
-            
-            # Get tables
-            cursor.execute("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public'
-                AND table_type = 'BASE TABLE'
-            """)
-            tables = [t[0] for t in cursor.fetchall()]
+        # One query per catalog (columns, foreign keys, indexes) regardless of table count,
+        # skipped entirely while the cheap schema version probe reports no change
+        if db_type != "mongodb":
+            with pool_manager.connection(db_config) as conn:
+                snapshot, from_cache = schema_cache.get(
+                    db_config, conn, lambda conn: introspect_schema(conn, db_type)
+                )
+            schema["tables"] = snapshot["tables"]
             
-            for table in tables:
-                # Get columns
-                cursor.execute(f"""
-                    SELECT 
-                        column_name, data_type, is_nullable,
-                        column_default, ordinal_position
-                    FROM information_schema.columns
-                    WHERE table_name = '{table}'
-                    ORDER BY ordinal_position
-                """)
-                columns = cursor.fetchall()
-                
-                # Get constraints
-                cursor.execute(f"""
-                    SELECT
-                        kcu.column_name,
-                        ccu.table_name AS foreign_table,
-                        ccu.column_name AS foreign_column
-                    FROM information_schema.table_constraints AS tc
-                    JOIN information_schema.key_column_usage AS kcu
-                        ON tc.constraint_name = kcu.constraint_name
-                    JOIN information_schema.constraint_column_usage AS ccu
-                        ON ccu.constraint_name = tc.constraint_name
-                    WHERE tc.table_name = '{table}'
-                    AND tc.constraint_type = 'FOREIGN KEY'
-                """)
-                foreign_keys = cursor.fetchall()
-                
-                table_schema = {
-                    "name": table,
-                    "columns": [
-                        {
-                            "name": col[0],
-                            "data_type": col[1],
-                            "nullable": col[2] == "YES",
-                            "default": col[3],
-                            "foreign_key": next((
-                                {"table": fk[1], "column": fk[2]} 
-                                for fk in foreign_keys 
-                                if fk[0] == col[0]
-                            ), None)
-                        } for col in columns
-                    ]
-                }
-                schema["tables"].append(table_schema)
-            cursor.close()
-            conn.close()
-
-        # SQLite implementation
-        elif db_type == "sqlite":
-            conn = sqlite3.connect(db_config.get("database", ":memory:"))
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [t[0] for t in cursor.fetchall()]
-            
-            for table in tables:
-                cursor.execute(f"PRAGMA table_info('{table}')")
-                columns = cursor.fetchall()
-                
-                cursor.execute(f"PRAGMA foreign_key_list('{table}')")
-                foreign_keys = cursor.fetchall()
-                
-                table_schema = {
-                    "name": table,
-                    "columns": [
-                        {
-                            "name": col[1],
-                            "data_type": col[2],
-                            "nullable": not col[3],
-                            "primary_key": col[5] == 1,
-                            "foreign_key": next((
-                                {"table": fk[2], "column": fk[3]} 
-                                for fk in foreign_keys 
-                                if fk[3] == col[1]
-                            ), None)
-                        } for col in columns
-                    ]
-                }
-                schema["tables"].append(table_schema)
-            cursor.close()
-            conn.close()
+            # Compressed responses carry the weak form of the ETag, so compare weakly
+            if request.if_none_match.contains_weak(snapshot["etag"]):
+                response = Response(status=304)
+                response.set_etag(snapshot["etag"], weak=not request.if_none_match.contains(snapshot["etag"]))
+                return response
 
         # Add execution metadata
         schema["metadata"] = {
             "execution_time": round(time.time() - start_time, 2),
             "database_type": db_type,
-            "table_count": len(schema["tables"])
+            "table_count": len(schema["tables"]),
+            "cached": from_cache,
+            "schema_version": snapshot["version"] if snapshot else None
         }
         
-        return jsonify(schema)
+        response = jsonify(schema)
+        if snapshot:
+            response.set_etag(snapshot["etag"])
+        return response
     
     except Exception as e:
         logger.error(f"Schema extraction failed: {str(e)}")
         return jsonify({"error": f"Schema extraction failed: {str(e)}"}), 500
 
 
+@app.route("/schema/tables", methods=["GET"])
+def browse_tables():
+    """API to list one page of tables with row estimates, filterable by name."""
+    global db_config, is_connected
+    
+    if not is_connected:
+        return jsonify({"error": "Database not connected"}), 400
+    
+    name_filter = request.args.get("name", "")
+    limit = max(1, min(request.args.get("limit", SCHEMA_PAGE_SIZE, type=int), SCHEMA_MAX_PAGE_SIZE))
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    
+    try:
+        db_type = db_config["dbType"].lower()
+        
+        if db_type == "mongodb":
+            db_name = db_config.get("database")
+            db = pool_manager.mongo_client(db_config)[db_name] if db_name else None
+            names = sorted(
+                name for name in (db.list_collection_names() if db is not None else [])
+                if name_filter.lower() in name.lower()
+            )
+            total = len(names)
+            tables = [
+                {"name": name, "type": "COLLECTION", "row_estimate": db[name].estimated_document_count()}
+                for name in names[offset:offset + limit]
+            ]
+        else:
+            with pool_manager.connection(db_config) as conn:
+                tables, total = list_tables(conn, db_type, name_filter, limit, offset)
+        
+        return jsonify({
+            "success": True,
+            "tables": tables,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "has_more": total is not None and offset + len(tables) < total
+        })
+    
+    except Exception as e:
+        logger.error(f"Table listing failed: {str(e)}")
+        return jsonify({"error": f"Table listing failed: {str(e)}"}), 500
+
+@app.route("/schema/tables/<table_name>", methods=["GET"])
+def describe_table(table_name):
+    """API to introspect the columns, keys and indexes of a single table."""
+    global db_config, is_connected
+    
+    if not is_connected:
+        return jsonify({"error": "Database not connected"}), 400
+    
+    db_type = db_config["dbType"].lower()
+    if db_type == "mongodb":
+        return jsonify({"error": "Table details are not supported for MongoDB"}), 400
+    
+    try:
+        with pool_manager.connection(db_config) as conn:
+            tables = introspect_schema(conn, db_type, table=table_name)
+        
+        if not tables:
+            return jsonify({"error": f"Table not found: {table_name}"}), 404
+        
+        return jsonify({"success": True, "table": tables[0]})
+    
+    except Exception as e:
+        logger.error(f"Table introspection failed: {str(e)}")
+        return jsonify({"error": f"Table introspection failed: {str(e)}"}), 500
+
+
 @app.route("/execute-sql", methods=["POST"])
 def execute_sql():
     """API to execute SQL queries."""
@@ -325,160 +310,441 @@ def execute_sql():
     if not sql_query:
         return jsonify({"error": "Empty SQL query"}), 400
     
+    try:
+        result_format = negotiate_format(data.get("format"), request.headers.get("Accept", ""))
+    except UnsupportedFormatError as err:
+        return jsonify({"error": str(err)}), 406
+    
     try:
         db_type = db_config.get("dbType", "mysql")
         
-        # Execute query based on database type
-        if db_type == "mysql" or db_type == "mariadb":
-            return execute_mysql_query(sql_query)
-        elif db_type == "postgresql" or db_type == "postgres":
-            return execute_postgres_query(sql_query)
-        elif db_type == "sqlite":
-            return execute_sqlite_query(sql_query)
-        elif db_type == "sqlserver":
-            return execute_sqlserver_query(sql_query)
-        elif db_type == "mongodb":
+        # Stream large SELECT results instead of materializing them
+        stream_format = get_stream_format(data)
+        if stream_format and db_type != "mongodb" and sql_query.split()[0].upper() == "SELECT":
+            return stream_select_query(sql_query, stream_format, data)
+        
+        # Page through large SELECT results with a pinned server-side cursor
+        if data.get("page_size") is not None and db_type != "mongodb" and sql_query.split()[0].upper() == "SELECT":
+            return open_paged_query(sql_query, data)
+        
+        # Enforce the row/byte budget, pushing the row limit into the query when allowed
+        max_rows, max_bytes, auto_limit = resolve_budget(data)
+        if auto_limit and sql_query.split()[0].upper() == "SELECT":
+            sql_query = apply_row_limit(sql_query, db_type, max_rows + 1)
+        
+        options = {
+            "config": dict(db_config),
+            "max_rows": max_rows,
+            "max_bytes": max_bytes,
+            "timeout": resolve_timeout(data),
+            # Clients may pick the id up front so they can cancel before the response arrives
+            "query_id": data.get("query_id"),
+            "use_cache": RESULT_CACHE_ENABLED and data.get("cache", True) is not False
+        }
+        
+        if db_type == "mongodb":
             return jsonify({"error": "Direct SQL execution not supported for MongoDB"}), 400
-        else:
+        if db_type not in QUERY_EXECUTORS:
             return jsonify({"error": f"Unsupported database type: {db_type}"}), 400
         
+        # Long-running queries can be submitted as a background job and polled
+        if data.get("async"):
+            return submit_query_job(sql_query, options, result_format)
+        
+        # Execute query based on database type
+        result = run_query(sql_query, options)
+        return render_query_result(result, result_format)
+        
+    except (InvalidBudgetError, InvalidTimeoutError) as err:
+        return jsonify({"error": str(err)}), 400
+    except QueryCancelledError as err:
+        return jsonify({"error": str(err), "cancelled": True}), 409
+    except QueryTimeoutError as err:
+        return jsonify({"error": str(err), "timed_out": True}), 504
+    except JobQueueFullError as err:
+        return jsonify({"error": str(err)}), 429
     except Exception as err:
         return jsonify({"error": str(err)}), 500
 
-def execute_mysql_query(sql_query):
-    """Execute query for MySQL/MariaDB."""
-    conn = mysql.connector.connect(**{k: v for k, v in db_config.items() if k != "dbType"})
-    cursor = conn.cursor(dictionary=True)
+def submit_query_job(sql_query, options, result_format):
+    """Queue a query on the job pool and return its id for polling."""
+    if result_format not in ("json", "compact"):
+        return jsonify({"error": "Async jobs support only the json and compact result formats"}), 406
     
-    # Determine query type
-    query_type = sql_query.split()[0].upper()
+    config = options["config"]
     
-    # Execute the query
-    cursor.execute(sql_query)
-    
-    # Handle different query types
-    if query_type == "SELECT":
-        result = cursor.fetchall()
-        message = f"Query executed successfully. Returned {len(result)} rows."
-    else:
-        # For INSERT, UPDATE, DELETE, etc.
-        conn.commit()
-        affected_rows = cursor.rowcount
-        result = [{"affected_rows": affected_rows}]
-        message = f"Query executed successfully. Affected {affected_rows} rows."
+    def run(job, spool):
+        if job.cancel_requested:
+            raise QueryCancelledError(f"Job {job.job_id} was cancelled before it started")
+        result = run_query(sql_query, dict(options, query_id=job.job_id))
+        for chunk in payload_chunks(result, result_format, app.json.dumps):
+            spool.write(chunk.encode("utf-8"))
+        return {
+            "query_type": result["query_type"],
+            "row_count": len(result["rows"]) if "rows" in result else None,
+            "affected_rows": result.get("affected_rows"),
+            "truncated": result.get("truncated", False)
+        }
     
-    cursor.close()
-    conn.close()
+    # The job id doubles as the query id so running jobs can be cancelled natively
+    job = job_manager.submit(
+        run,
+        target=f"{config['dbType']}://{config.get('user', '')}@{config.get('host', '')}/{config.get('database', '')}",
+        description={"sql": sql_query, "database": config.get("database", "")},
+        on_cancel=lambda job: query_registry.cancel(job.job_id)
+    )
     
     return jsonify({
         "success": True,
-        "message": message,
-        "query_type": query_type,
-        "result": result
-    })
+        "message": "Query submitted for background execution",
+        "job_id": job.job_id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.job_id}",
+        "result_url": f"/jobs/{job.job_id}/result"
+    }), 202
 
-def execute_postgres_query(sql_query):
-    """Execute query for PostgreSQL."""
-    conn = psycopg2.connect(**{k: v for k, v in db_config.items() if k != "dbType"})
-    cursor = conn.cursor()
-    
-    # Determine query type
+def run_query(sql_query, options):
+    """
+    Execute a buffered query through the result cache. Deterministic SELECTs
+    are served from and stored in the cache; writes invalidate the cached
+    results of the tables they touch.
+    """
+    config = options["config"]
+    executor = QUERY_EXECUTORS[config["dbType"]]
     query_type = sql_query.split()[0].upper()
     
-    # Execute the query
-    cursor.execute(sql_query)
-    
-    # Handle different query types
     if query_type == "SELECT":
-        columns = [desc[0] for desc in cursor.description]
-        result = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        message = f"Query executed successfully. Returned {len(result)} rows."
+        if not options.get("use_cache") or not result_cache.is_cacheable(sql_query):
+            return executor(sql_query, options)
+        
+        # The budget changes what is returned, so it is part of the key
+        key = result_cache.make_key(config, sql_query, options["max_rows"], options["max_bytes"])
+        cached = result_cache.get(key)
+        if cached is not None:
+            return dict(cached, cached=True)
+        
+        # A write that commits while this SELECT runs makes its result stale before it is stored
+        generation = result_cache.generation(config)
+        result = executor(sql_query, options)
+        result_cache.put(key, config, sql_query, result, generation)
+        return result
+    
+    try:
+        return executor(sql_query, options)
+    finally:
+        # Unknown targets (e.g. multi-statement scripts) drop every cached result of the connection
+        result_cache.invalidate(config, write_tables(sql_query))
+        if is_schema_change(sql_query):
+            schema_cache.invalidate(config)
+
+def get_stream_format(data):
+    """Return 'ndjson' or 'json' if the client asked for a streamed result."""
+    stream = data.get("stream")
+    if stream in ("ndjson", "json"):
+        return stream
+    if stream is True or "application/x-ndjson" in request.headers.get("Accept", ""):
+        return "ndjson"
+    return None
+
+def track_stream(sql_query, data, query_id):
+    """Build the RowStream hook that registers a streamed query for timeouts and /cancel-query."""
+    config = dict(db_config)
+    timeout = resolve_timeout(data)
+    return lambda conn: query_registry.track(conn, config, sql_query, timeout, query_id)
+
+def stream_select_query(sql_query, stream_format, data):
+    """Execute a SELECT with a server-side cursor and stream rows as they are fetched."""
+    query_id = data.get("query_id") or uuid.uuid4().hex
+    stream = RowStream(
+        pool_manager.get_pool(db_config), sql_query, track=track_stream(sql_query, data, query_id)
+    )
+    
+    if stream_format == "ndjson":
+        response = Response(ndjson_chunks(stream, app.json.dumps), mimetype="application/x-ndjson")
     else:
-        conn.commit()
-        affected_rows = cursor.rowcount
-        result = [{"affected_rows": affected_rows}]
-        message = f"Query executed successfully. Affected {affected_rows} rows."
+        response = Response(json_chunks(stream, app.json.dumps, "SELECT"), mimetype="application/json")
     
-    cursor.close()
-    conn.close()
+    # Release the connection even if the client disconnects before the first chunk
+    response.call_on_close(stream.close)
+    # Ask reverse proxies not to buffer the chunked body
+    response.headers["X-Accel-Buffering"] = "no"
+    response.headers["X-Query-Id"] = query_id
+    return response
+
+def open_paged_query(sql_query, data):
+    """Execute a SELECT, return its first page and keep the cursor open for /fetch-next."""
+    try:
+        page_size = parse_page_size(data["page_size"])
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    session_id = data.get("session_id") or request.remote_addr
+    
+    # The cursor id doubles as the query id so an open cursor can be cancelled
+    query_id = data.get("query_id") or uuid.uuid4().hex
+    stream = RowStream(
+        pool_manager.get_pool(db_config), sql_query, batch_size=page_size,
+        track=track_stream(sql_query, data, query_id)
+    )
+    rows = stream.fetch_page()
+    has_more = len(rows) == page_size
+    
+    if has_more:
+        try:
+            cursor_id = cursor_registry.open(session_id, stream, query_id)
+        except CursorLimitError as err:
+            stream.close()
+            return jsonify({"error": str(err)}), 429
+    else:
+        cursor_id = None
+        stream.close()
     
     return jsonify({
         "success": True,
-        "message": message,
-        "query_type": query_type,
-        "result": result
+        "message": f"Query executed successfully. Returned {len(rows)} rows{' (more available)' if has_more else ''}.",
+        "query_type": "SELECT",
+        "columns": stream.columns,
+        "result": rows,
+        "cursor_id": cursor_id,
+        "has_more": has_more,
+        "row_count": stream.row_count
     })
 
-def execute_sqlite_query(sql_query):
-    """Execute query for SQLite."""
-    conn = sqlite3.connect(db_config.get("database", ":memory:"))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+def collect_query_result(conn, cursor, query_type, db_type, options):
+    """Fetch a SELECT result within its row/byte budget, or commit a write."""
+    if query_type == "SELECT":
+        rows, truncated, _ = fetch_with_budget(cursor, options["max_rows"], options["max_bytes"])
+        columns, types = describe_columns(cursor, db_type, rows)
+        return {
+            "query_type": query_type,
+            "columns": columns,
+            "types": types,
+            "rows": rows,
+            "truncated": truncated
+        }
     
-    # Determine query type
-    query_type = sql_query.split()[0].upper()
+    # For INSERT, UPDATE, DELETE, etc.
+    conn.commit()
+    return {"query_type": query_type, "affected_rows": cursor.rowcount}
+
+def render_query_result(result, result_format):
+    """Encode an executed query result in the negotiated format."""
+    if result_format == "arrow":
+        response = Response(encode_arrow(result), mimetype=RESULT_FORMATS["arrow"])
+        response.headers["X-Query-Type"] = result["query_type"]
+        response.headers["X-Row-Count"] = str(len(result.get("rows", [])))
+        response.headers["X-Truncated"] = str(result.get("truncated", False)).lower()
+        response.headers["X-Cache"] = "HIT" if result.get("cached") else "MISS"
+        return response
     
-    # Execute the query
-    cursor.execute(sql_query)
+    payload = build_payload(result, result_format)
+    if result_format == "msgpack":
+        return Response(encode_msgpack(payload), mimetype=RESULT_FORMATS["msgpack"])
+    return jsonify(payload)
+
+def execute_mysql_query(sql_query, options):
+    """Execute query for MySQL/MariaDB."""
+    with pool_manager.connection(options["config"]) as conn:
+        cursor = conn.cursor()
+        
+        # Determine query type
+        query_type = sql_query.split()[0].upper()
+        
+        with query_registry.track(conn, options["config"], sql_query, options["timeout"], options["query_id"]):
+            # Execute the query
+            cursor.execute(sql_query)
+            result = collect_query_result(conn, cursor, query_type, "mysql", options)
+            if result.get("truncated"):
+                # Unbuffered cursors must drain unread rows before closing
+                conn.consume_results()
+            cursor.close()
     
-    # Handle different query types
-    if query_type == "SELECT":
-        rows = cursor.fetchall()
-        # Convert sqlite3.Row objects to dictionaries
-        result = [dict(row) for row in rows]
-        message = f"Query executed successfully. Returned {len(result)} rows."
-    else:
-        conn.commit()
-        affected_rows = cursor.rowcount
-        result = [{"affected_rows": affected_rows}]
-        message = f"Query executed successfully. Affected {affected_rows} rows."
+    return result
+
+def execute_postgres_query(sql_query, options):
+    """Execute query for PostgreSQL."""
+    with pool_manager.connection(options["config"]) as conn:
+        # Determine query type
+        query_type = sql_query.split()[0].upper()
+        
+        # psycopg2 client cursors buffer the whole result; read SELECTs server-side instead
+        cursor = open_stream_cursor(conn, "postgres") if query_type == "SELECT" else conn.cursor()
+        
+        with query_registry.track(conn, options["config"], sql_query, options["timeout"], options["query_id"]):
+            # Execute the query
+            cursor.execute(sql_query)
+            result = collect_query_result(conn, cursor, query_type, "postgres", options)
+            cursor.close()
     
-    cursor.close()
-    conn.close()
+    return result
+
+def execute_sqlite_query(sql_query, options):
+    """Execute query for SQLite."""
+    with pool_manager.connection(options["config"]) as conn:
+        cursor = conn.cursor()
+        
+        # Determine query type
+        query_type = sql_query.split()[0].upper()
+        
+        with query_registry.track(conn, options["config"], sql_query, options["timeout"], options["query_id"]):
+            # Execute the query
+            cursor.execute(sql_query)
+            result = collect_query_result(conn, cursor, query_type, "sqlite", options)
+            cursor.close()
     
+    return result
+
+def execute_sqlserver_query(sql_query, options):
+    """Execute query for SQL Server."""
+    with pool_manager.connection(options["config"]) as conn:
+        cursor = conn.cursor()
+        
+        # Determine query type
+        query_type = sql_query.split()[0].upper()
+        
+        with query_registry.track(conn, options["config"], sql_query, options["timeout"], options["query_id"]):
+            # Execute the query
+            cursor.execute(sql_query)
+            result = collect_query_result(conn, cursor, query_type, "sqlserver", options)
+            cursor.close()
+    
+    return result
+
+# Buffered executors by database type
+QUERY_EXECUTORS = {
+    "mysql": execute_mysql_query,
+    "mariadb": execute_mysql_query,
+    "postgresql": execute_postgres_query,
+    "postgres": execute_postgres_query,
+    "sqlite": execute_sqlite_query,
+    "sqlserver": execute_sqlserver_query
+}
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    """API to list background query jobs."""
+    job_manager.sweep()
     return jsonify({
         "success": True,
-        "message": message,
-        "query_type": query_type,
-        "result": result
+        "jobs": job_manager.list(),
+        "stats": job_manager.stats()
     })
 
-def execute_sqlserver_query(sql_query):
-    """Execute query for SQL Server."""
-    conn = pymssql.connect(
-        server=db_config.get("host"),
-        user=db_config.get("user"),
-        password=db_config.get("password"),
-        database=db_config.get("database")
-    )
-    cursor = conn.cursor(as_dict=True)
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """API to poll the status, row counts and timings of a background job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found or expired"}), 404
     
-    # Determine query type
-    query_type = sql_query.split()[0].upper()
+    status = job.to_dict()
+    if job.status == "succeeded":
+        status["result_url"] = f"/jobs/{job_id}/result"
+    return jsonify(status)
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    """API to download the spooled result of a finished job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found or expired"}), 404
+    if job.status != "succeeded":
+        return jsonify({"error": f"Job {job_id} is {job.status}", "status": job.status}), 409
+    
+    chunks = job_manager.read_result(job_id)
+    if chunks is None:
+        return jsonify({"error": f"Job {job_id} not found or expired"}), 404
+    return Response(chunks, mimetype="application/json")
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """API to cancel a queued or running job."""
+    try:
+        if not job_manager.cancel(job_id):
+            return jsonify({"error": f"Job {job_id} is not queued or running"}), 404
+        return jsonify({
+            "success": True,
+            "message": f"Cancellation requested for job {job_id}"
+        })
+    except Exception as err:
+        return jsonify({"error": str(err)}), 500
+
+@app.route("/fetch-next", methods=["POST"])
+def fetch_next():
+    """API to fetch the next page from a cursor opened by /execute-sql."""
+    data = request.json
     
-    # Execute the query
-    cursor.execute(sql_query)
+    if not data or not data.get("cursor_id"):
+        return jsonify({"error": "cursor_id is required"}), 400
     
-    # Handle different query types
-    if query_type == "SELECT":
-        result = cursor.fetchall()
-        message = f"Query executed successfully. Returned {len(result)} rows."
-    else:
-        conn.commit()
-        affected_rows = cursor.rowcount
-        result = [{"affected_rows": affected_rows}]
-        message = f"Query executed successfully. Affected {affected_rows} rows."
+    try:
+        page_size = parse_page_size(data["page_size"]) if data.get("page_size") is not None else None
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    
+    try:
+        # Idle time between pages does not count against the statement timeout
+        query_registry.extend(data["cursor_id"])
+        rows, has_more, row_count = cursor_registry.fetch(data["cursor_id"], page_size)
+        
+        return jsonify({
+            "success": True,
+            "result": rows,
+            "cursor_id": data["cursor_id"] if has_more else None,
+            "has_more": has_more,
+            "row_count": row_count
+        })
+    except CursorNotFoundError as err:
+        return jsonify({"error": str(err)}), 404
+    except QueryCancelledError as err:
+        cursor_registry.close(data["cursor_id"])
+        return jsonify({"error": str(err), "cancelled": True}), 409
+    except QueryTimeoutError as err:
+        cursor_registry.close(data["cursor_id"])
+        return jsonify({"error": str(err), "timed_out": True}), 504
+    except Exception as err:
+        cursor_registry.close(data["cursor_id"])
+        return jsonify({"error": str(err)}), 500
+
+@app.route("/close-cursor", methods=["POST"])
+def close_cursor():
+    """API to release a cursor before it expires."""
+    data = request.json
     
-    cursor.close()
-    conn.close()
+    if not data or not data.get("cursor_id"):
+        return jsonify({"error": "cursor_id is required"}), 400
     
     return jsonify({
         "success": True,
-        "message": message,
-        "query_type": query_type,
-        "result": result
+        "closed": cursor_registry.close(data["cursor_id"])
     })
 
+@app.route("/running-queries", methods=["GET"])
+def running_queries():
+    """API to list queries currently executing through /execute-sql."""
+    return jsonify({
+        "success": True,
+        "queries": query_registry.running()
+    })
+
+@app.route("/cancel-query", methods=["POST"])
+def cancel_query():
+    """API to cancel a running query by its query_id."""
+    data = request.json
+    
+    if not data or not data.get("query_id"):
+        return jsonify({"error": "query_id is required"}), 400
+    
+    try:
+        if not query_registry.cancel(data["query_id"]):
+            return jsonify({"error": f"No running query with id {data['query_id']}"}), 404
+        
+        return jsonify({
+            "success": True,
+            "message": f"Cancellation requested for query {data['query_id']}"
+        })
+    except Exception as err:
+        return jsonify({"error": str(err)}), 500
+
 @app.route("/get-tables", methods=["GET"])
 def get_tables():
     """API to get all tables in the current database."""
@@ -492,52 +758,37 @@ def get_tables():
         tables = []
         
         if db_type == "mysql" or db_type == "mariadb":
-            conn = mysql.connector.connect(**{k: v for k, v in db_config.items() if k != "dbType"})
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SHOW TABLES")
-            tables_raw = cursor.fetchall()
-            tables = [list(table.values())[0] for table in tables_raw]
-            cursor.close()
-            conn.close()
+            with pool_manager.connection(db_config) as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute("SHOW TABLES")
+                tables_raw = cursor.fetchall()
+                tables = [list(table.values())[0] for table in tables_raw]
+                cursor.close()
         elif db_type == "postgresql" or db_type == "postgres":
-            conn = psycopg2.connect(**{k: v for k, v in db_config.items() if k != "dbType"})
-            cursor = conn.cursor()
-            cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'")
-            tables = [table[0] for table in cursor.fetchall()]
-            cursor.close()
-            conn.close()
+            with pool_manager.connection(db_config) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'")
+                tables = [table[0] for table in cursor.fetchall()]
+                cursor.close()
         elif db_type == "sqlite":
-            conn = sqlite3.connect(db_config.get("database", ":memory:"))
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [table[0] for table in cursor.fetchall()]
-            cursor.close()
-            conn.close()
+            with pool_manager.connection(db_config) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+                tables = [table[0] for table in cursor.fetchall()]
+                cursor.close()
         elif db_type == "sqlserver":
-            conn = pymssql.connect(
-                server=db_config.get("host"),
-                user=db_config.get("user"),
-                password=db_config.get("password"),
-                database=db_config.get("database")
-            )
-            cursor = conn.cursor()
-            cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'")
-            tables = [table[0] for table in cursor.fetchall()]
-            cursor.close()
-            conn.close()
+            with pool_manager.connection(db_config) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'")
+                tables = [table[0] for table in cursor.fetchall()]
+                cursor.close()
         elif db_type == "mongodb":
-            client = pymongo.MongoClient(
-                host=db_config.get("host", "localhost"),
-                port=db_config.get("port", 27017),
-                username=db_config.get("user"),
-                password=db_config.get("password")
-            )
+            client = pool_manager.mongo_client(db_config)
             db_name = db_config.get("database")
             if db_name:
                 tables = client[db_name].list_collection_names()
             else:
                 tables = []
-            client.close()
         
         return jsonify({
             "success": True,
@@ -581,46 +832,25 @@ def generate_data():
         # Create table based on database type
         if db_type == "mysql" or db_type == "mariadb":
             create_table_sql = generate_mysql_create_table_sql(table_name, schema['columns'])
-            conn = mysql.connector.connect(**{k: v for k, v in db_config.items() if k != "dbType"})
-            cursor = conn.cursor()
-            cursor.execute(create_table_sql)
-            conn.commit()
         elif db_type == "postgresql" or db_type == "postgres":
             create_table_sql = generate_postgres_create_table_sql(table_name, schema['columns'])
-            conn = psycopg2.connect(**{k: v for k, v in db_config.items() if k != "dbType"})
-            cursor = conn.cursor()
-            cursor.execute(create_table_sql)
-            conn.commit()
         elif db_type == "sqlite":
             create_table_sql = generate_sqlite_create_table_sql(table_name, schema['columns'])
-            conn = sqlite3.connect(db_config.get("database", ":memory:"))
-            cursor = conn.cursor()
-            cursor.execute(create_table_sql)
-            conn.commit()
         elif db_type == "sqlserver":
             create_table_sql = generate_sqlserver_create_table_sql(table_name, schema['columns'])
-            conn = pymssql.connect(
-                server=db_config.get("host"),
-                user=db_config.get("user"),
-                password=db_config.get("password"),
-                database=db_config.get("database")
-            )
-            cursor = conn.cursor()
-            cursor.execute(create_table_sql)
-            conn.commit()
         elif db_type == "mongodb":
             # For MongoDB, we don't need to create a table/collection beforehand
-            client = pymongo.MongoClient(
-                host=db_config.get("host", "localhost"),
-                port=db_config.get("port", 27017),
-                username=db_config.get("user"),
-                password=db_config.get("password")
-            )
-            conn = client
-            cursor = None
+            create_table_sql = None
         else:
             return jsonify({"error": f"Unsupported database type: {db_type}"}), 400
         
+        if create_table_sql:
+            with pool_manager.connection(db_config) as conn:
+                cursor = conn.cursor()
+                cursor.execute(create_table_sql)
+                conn.commit()
+                cursor.close()
+        
         # Generate synthetic data using the imported function
         try:
             # Use gemini_service to generate data
@@ -641,55 +871,60 @@ def generate_data():
             if not db_name:
                 return jsonify({'error': 'Database name required for MongoDB'}), 400
                 
-            db = conn[db_name]
+            db = pool_manager.mongo_client(db_config)[db_name]
             collection = db[table_name]
             
             if records:
                 result = collection.insert_many(records)
                 inserted_count = len(result.inserted_ids)
-            
-            client.close()
         else:
             # SQL database insertion
-            for record in records:
-                # Skip auto increment columns
-                filtered_record = {k: v for k, v in record.items() 
-                                if not any(col.get("autoIncrement", False) and col["name"] == k 
-                                           for col in schema['columns'])}
-                
-                if not filtered_record:  # Skip if all columns were filtered out
-                    continue
+            with pool_manager.connection(db_config) as conn:
+                cursor = conn.cursor()
+                for record in records:
+                    # Skip auto increment columns
+                    filtered_record = {k: v for k, v in record.items() 
+                                    if not any(col.get("autoIncrement", False) and col["name"] == k 
+                                               for col in schema['columns'])}
                     
-                columns = list(filtered_record.keys())
-                values = list(filtered_record.values())
-                
-                if db_type == "mysql" or db_type == "mariadb":
-                    placeholders = ', '.join(['%s'] * len(filtered_record))
-                    columns_str = ', '.join(f"`{col}`" for col in columns)
-                    insert_sql = f"INSERT INTO `{table_name}` ({columns_str}) VALUES ({placeholders})"
-                elif db_type == "postgresql" or db_type == "postgres":
-                    placeholders = ', '.join(['%s'] * len(filtered_record))
-                    columns_str = ', '.join(f"\"{col}\"" for col in columns)
-                    insert_sql = f"INSERT INTO \"{table_name}\" ({columns_str}) VALUES ({placeholders})"
-                elif db_type == "sqlite":
-                    placeholders = ', '.join(['?'] * len(filtered_record))
-                    columns_str = ', '.join(f"\"{col}\"" for col in columns)
-                    insert_sql = f"INSERT INTO \"{table_name}\" ({columns_str}) VALUES ({placeholders})"
-                elif db_type == "sqlserver":
-                    placeholders = ', '.join(['%s'] * len(filtered_record))
-                    columns_str = ', '.join(f"[{col}]" for col in columns)
-                    insert_sql = f"INSERT INTO [{table_name}] ({columns_str}) VALUES ({placeholders})"
+                    if not filtered_record:  # Skip if all columns were filtered out
+                        continue
+                        
+                    columns = list(filtered_record.keys())
+                    values = list(filtered_record.values())
+                    
+                    if db_type == "mysql" or db_type == "mariadb":
+                        placeholders = ', '.join(['%s'] * len(filtered_record))
+                        columns_str = ', '.join(f"`{col}`" for col in columns)
+                        insert_sql = f"INSERT INTO `{table_name}` ({columns_str}) VALUES ({placeholders})"
+                    elif db_type == "postgresql" or db_type == "postgres":
+                        placeholders = ', '.join(['%s'] * len(filtered_record))
+                        columns_str = ', '.join(f"\"{col}\"" for col in columns)
+                        insert_sql = f"INSERT INTO \"{table_name}\" ({columns_str}) VALUES ({placeholders})"
+                    elif db_type == "sqlite":
+                        placeholders = ', '.join(['?'] * len(filtered_record))
+                        columns_str = ', '.join(f"\"{col}\"" for col in columns)
+                        insert_sql = f"INSERT INTO \"{table_name}\" ({columns_str}) VALUES ({placeholders})"
+                    elif db_type == "sqlserver":
+                        placeholders = ', '.join(['%s'] * len(filtered_record))
+                        columns_str = ', '.join(f"[{col}]" for col in columns)
+                        insert_sql = f"INSERT INTO [{table_name}] ({columns_str}) VALUES ({placeholders})"
+                    
+                    try:
+                        cursor.execute(insert_sql, values)
+                        inserted_count += 1
+                    except Exception as err:
+                        logger.error(f"Error inserting record: {err}")
                 
-                try:
-                    cursor.execute(insert_sql, values)
-                    inserted_count += 1
-                except Exception as err:
-                    logger.error(f"Error inserting record: {err}")
+                # Commit before the connection goes back to the pool
+                conn.commit()
+                cursor.close()
             
-            # Commit and close for SQL databases
-            conn.commit()
-            cursor.close()
-            conn.close()
+            # Cached SELECTs over the filled table are now stale
+            result_cache.invalidate(db_config, [table_name])
+        
+        # The generated table changed the schema
+        schema_cache.invalidate(db_config)
         
         end_time = time.time()
         execution_time = round(end_time - start_time, 2)
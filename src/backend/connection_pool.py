@@ -0,0 +1,308 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import mysql.connector
+import psycopg2
+import pymongo
+import sqlite3
+import pymssql
+
+logger = logging.getLogger(__name__)
+
+# Pool configuration from environment variables
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 10))
+POOL_IDLE_TIMEOUT = float(os.environ.get("DB_POOL_IDLE_TIMEOUT", 300))
+POOL_CHECKOUT_TIMEOUT = float(os.environ.get("DB_POOL_CHECKOUT_TIMEOUT", 30))
+POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+
+MYSQL_TYPES = ("mysql", "mariadb")
+POSTGRES_TYPES = ("postgresql", "postgres")
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+def config_key(config):
+    """Build a hashable pool key from a stored db_config dict."""
+    return tuple(sorted((k, str(v)) for k, v in config.items()))
+
+
+def open_connection(config):
+    """Open a brand-new driver connection for the given db_config."""
+    db_type = config.get("dbType", "mysql").lower()
+    params = {k: v for k, v in config.items() if k != "dbType"}
+
+    if db_type in MYSQL_TYPES:
+        return mysql.connector.connect(**params)
+    elif db_type in POSTGRES_TYPES:
+        return psycopg2.connect(**params)
+    elif db_type == "sqlite":
+        # Pooled connections are handed to whichever Flask thread checks them out
+        return sqlite3.connect(config.get("database", ":memory:"), check_same_thread=False)
+    elif db_type == "sqlserver":
+        return pymssql.connect(
+            server=config.get("host"),
+            user=config.get("user"),
+            password=config.get("password"),
+            database=config.get("database")
+        )
+    raise ValueError(f"Unsupported database type: {db_type}")
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections for a single db_config.
+    Idle connections are reused LIFO, evicted after POOL_IDLE_TIMEOUT seconds
+    and optionally pinged before being handed out again.
+    """
+
+    def __init__(self, config, max_size=POOL_MAX_SIZE, idle_timeout=POOL_IDLE_TIMEOUT,
+                 checkout_timeout=POOL_CHECKOUT_TIMEOUT, pre_ping=POOL_PRE_PING):
+        self.config = dict(config)
+        self.db_type = self.config.get("dbType", "mysql").lower()
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.pre_ping = pre_ping
+
+        self._idle = []      # (connection, returned_at), oldest first
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._counters = {
+            "checkouts": 0,
+            "created": 0,
+            "reused": 0,
+            "closed": 0,
+            "evicted_idle": 0,
+            "failed_pings": 0,
+            "timeouts": 0
+        }
+
+    def acquire(self):
+        """Check out a healthy connection, opening a new one if needed."""
+        deadline = time.time() + self.checkout_timeout
+
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool has been disposed")
+
+                expired = self._evict_idle_locked()
+                while not self._idle and self._in_use >= self.max_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"No {self.db_type} connection available within {self.checkout_timeout}s "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+
+                conn = self._idle.pop()[0] if self._idle else None
+                self._in_use += 1
+                self._counters["checkouts"] += 1
+
+            self._close_all(expired)
+
+            if conn is None:
+                try:
+                    conn = open_connection(self.config)
+                except Exception:
+                    self._release_slot()
+                    raise
+                with self._cond:
+                    self._counters["created"] += 1
+                return conn
+
+            if self.pre_ping and not self._ping(conn):
+                with self._cond:
+                    self._counters["failed_pings"] += 1
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                self._counters["reused"] += 1
+            return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, ending any open transaction."""
+        try:
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            if not self._closed:
+                self._in_use -= 1
+                self._idle.append((conn, time.time()))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager yielding a pooled connection."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def dispose(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._cond.notify_all()
+        self._close_all(idle)
+
+    def stats(self):
+        """Return a snapshot of pool usage counters."""
+        with self._cond:
+            expired = self._evict_idle_locked()
+            snapshot = {
+                "db_type": self.db_type,
+                "host": self.config.get("host", ""),
+                "database": self.config.get("database", ""),
+                "user": self.config.get("user", ""),
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                **self._counters
+            }
+        self._close_all(expired)
+        return snapshot
+
+    def _ping(self, conn):
+        """Run a trivial statement to verify the connection is still alive."""
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled {self.db_type} connection failed pre-ping: {str(e)}")
+            return False
+
+    def _evict_idle_locked(self):
+        """Pop idle connections past the idle timeout. Caller holds the lock."""
+        cutoff = time.time() - self.idle_timeout
+        expired = []
+        while self._idle and self._idle[0][1] < cutoff:
+            expired.append(self._idle.pop(0)[0])
+        self._counters["evicted_idle"] += len(expired)
+        return expired
+
+    def _release_slot(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    def _discard(self, conn):
+        self._release_slot()
+        self._close_all([conn])
+
+    def _close_all(self, connections):
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            with self._cond:
+                self._counters["closed"] += 1
+
+
+class PoolManager:
+    """Registry of connection pools keyed by the stored db_config."""
+
+    def __init__(self):
+        self._pools = {}
+        self._mongo_clients = {}
+        self._lock = threading.Lock()
+
+    def get_pool(self, config):
+        """Get or create the pool for a db_config."""
+        key = config_key(config)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(config)
+                self._pools[key] = pool
+                logger.info(f"Created {pool.db_type} connection pool for {config.get('host', '')}/{config.get('database', '')}")
+            return pool
+
+    @contextmanager
+    def connection(self, config):
+        """Context manager yielding a pooled connection for a db_config."""
+        with self.get_pool(config).connection() as conn:
+            yield conn
+
+    def mongo_client(self, config):
+        """Get the shared MongoClient for a db_config (MongoClient pools internally)."""
+        key = config_key(config)
+        with self._lock:
+            client = self._mongo_clients.get(key)
+            if client is None:
+                client = pymongo.MongoClient(
+                    host=config.get("host", "localhost"),
+                    port=config.get("port", 27017),
+                    username=config.get("user"),
+                    password=config.get("password"),
+                    maxPoolSize=POOL_MAX_SIZE,
+                    maxIdleTimeMS=int(POOL_IDLE_TIMEOUT * 1000),
+                    waitQueueTimeoutMS=int(POOL_CHECKOUT_TIMEOUT * 1000)
+                )
+                self._mongo_clients[key] = client
+            return client
+
+    def dispose(self, config):
+        """Close the pool and Mongo client belonging to a single db_config."""
+        key = config_key(config)
+        with self._lock:
+            pool = self._pools.pop(key, None)
+            client = self._mongo_clients.pop(key, None)
+        if pool:
+            pool.dispose()
+        if client:
+            client.close()
+
+    def dispose_all(self, keep=None):
+        """Close every pool except the one for `keep` (if given)."""
+        keep_key = config_key(keep) if keep else None
+        with self._lock:
+            pools = [p for k, p in self._pools.items() if k != keep_key]
+            clients = [c for k, c in self._mongo_clients.items() if k != keep_key]
+            self._pools = {k: p for k, p in self._pools.items() if k == keep_key}
+            self._mongo_clients = {k: c for k, c in self._mongo_clients.items() if k == keep_key}
+        for pool in pools:
+            pool.dispose()
+        for client in clients:
+            client.close()
+
+    def stats(self):
+        """Return statistics for every active pool."""
+        with self._lock:
+            pools = list(self._pools.values())
+            mongo_count = len(self._mongo_clients)
+        return {
+            "pools": [pool.stats() for pool in pools],
+            "mongo_clients": mongo_count,
+            "settings": {
+                "max_size": POOL_MAX_SIZE,
+                "idle_timeout_seconds": POOL_IDLE_TIMEOUT,
+                "checkout_timeout_seconds": POOL_CHECKOUT_TIMEOUT,
+                "pre_ping": POOL_PRE_PING
+            }
+        }
+
+
+# Initialize a global instance of PoolManager
+pool_manager = PoolManager()
@@ -0,0 +1,213 @@
+import os
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Async job configuration from environment variables
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 8))
+JOB_MAX_PER_DATABASE = int(os.environ.get("JOB_MAX_PER_DATABASE", 2))
+JOB_MAX_QUEUED = int(os.environ.get("JOB_MAX_QUEUED", 100))
+JOB_RESULT_TTL_SECONDS = float(os.environ.get("JOB_RESULT_TTL_SECONDS", 900))
+# Results larger than this are spooled from memory to a temporary file
+JOB_SPOOL_MEMORY_BYTES = int(os.environ.get("JOB_SPOOL_MEMORY_BYTES", 1024 * 1024))
+# Bytes read from the spool per chunk when a result is downloaded
+JOB_RESULT_CHUNK_BYTES = int(os.environ.get("JOB_RESULT_CHUNK_BYTES", 64 * 1024))
+
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+
+class JobQueueFullError(Exception):
+    """Raised when too many jobs are already waiting to run."""
+
+
+class QueryJob:
+    """State of one asynchronously executed query."""
+
+    def __init__(self, run, target, description, on_cancel=None):
+        self.job_id = uuid.uuid4().hex
+        self.run = run
+        self.on_cancel = on_cancel
+        self.cancel_requested = False
+        self.target = target
+        self.description = description
+        self.status = "queued"
+        self.error = None
+        self.summary = {}
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.spool = None
+        self.result_bytes = 0
+
+    def to_dict(self):
+        """Status document returned by GET /jobs/<id>."""
+        now = time.time()
+        started = self.started_at or now
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "database": self.description.get("database", ""),
+            "sql": self.description.get("sql", "")[:500],
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_seconds": round(started - self.submitted_at, 3),
+            "run_seconds": round((self.finished_at or now) - started, 3) if self.started_at else None,
+            "result_bytes": self.result_bytes,
+            **self.summary
+        }
+
+
+class JobManager:
+    """
+    Runs query jobs on a bounded thread pool. Each target database has its
+    own FIFO queue and at most JOB_MAX_PER_DATABASE jobs running at once,
+    so one busy database cannot occupy every worker.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_per_target=JOB_MAX_PER_DATABASE, max_queued=JOB_MAX_QUEUED):
+        self.max_per_target = max_per_target
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sql-job")
+        self._jobs = {}
+        self._queues = {}   # target -> deque of waiting jobs
+        self._running = {}  # target -> number of running jobs
+        self._lock = threading.Lock()
+
+    def submit(self, run, target, description, on_cancel=None):
+        """
+        Queue a job. `run(job, spool)` writes the result payload to the
+        binary file `spool` as it is produced and returns a summary dict;
+        `on_cancel(job)` is called to stop a job that is already running.
+        """
+        self.sweep()
+        job = QueryJob(run, target, description, on_cancel)
+
+        with self._lock:
+            queued = sum(len(q) for q in self._queues.values())
+            if queued >= self.max_queued:
+                raise JobQueueFullError(f"Too many queued jobs ({queued}); try again later")
+            self._jobs[job.job_id] = job
+            self._queues.setdefault(target, deque()).append(job)
+
+        self._dispatch(target)
+        return job
+
+    def get(self, job_id):
+        """Return a job by id, or None."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        """Return status documents for every known job."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in jobs]
+
+    def read_result(self, job_id, chunk_size=JOB_RESULT_CHUNK_BYTES):
+        """Return an iterator over the spooled result of a succeeded job, or None."""
+        job = self.get(job_id)
+        if job is None or job.spool is None:
+            return None
+        return self._read_chunks(job, chunk_size)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns False if unknown or finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return False
+            job.cancel_requested = True
+            if job.status == "queued":
+                self._queues[job.target].remove(job)
+                job.status = "cancelled"
+                job.finished_at = time.time()
+                return True
+
+        if job.on_cancel:
+            job.on_cancel(job)
+        return True
+
+    def sweep(self):
+        """Forget finished jobs older than JOB_RESULT_TTL_SECONDS."""
+        cutoff = time.time() - JOB_RESULT_TTL_SECONDS
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job.status in FINISHED_STATES and job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job in expired:
+                del self._jobs[job.job_id]
+                # Closed under the lock so a download in progress stops cleanly
+                if job.spool:
+                    job.spool.close()
+        return len(expired)
+
+    def stats(self):
+        """Return queue depth and running counts per target."""
+        with self._lock:
+            return {
+                "queued": {str(t): len(q) for t, q in self._queues.items() if q},
+                "running": {str(t): n for t, n in self._running.items() if n},
+                "jobs": len(self._jobs),
+                "max_per_database": self.max_per_target
+            }
+
+    def _dispatch(self, target):
+        """Start queued jobs for a target while it has free slots."""
+        with self._lock:
+            queue = self._queues.get(target)
+            while queue and self._running.get(target, 0) < self.max_per_target:
+                job = queue.popleft()
+                job.status = "running"
+                job.started_at = time.time()
+                self._running[target] = self._running.get(target, 0) + 1
+                self._executor.submit(self._execute, job)
+
+    def _read_chunks(self, job, chunk_size):
+        # Each download keeps its own offset; concurrent readers share the file position
+        offset = 0
+        while True:
+            with self._lock:
+                if job.spool.closed:
+                    return
+                job.spool.seek(offset)
+                chunk = job.spool.read(chunk_size)
+            if not chunk:
+                return
+            offset += len(chunk)
+            yield chunk
+
+    def _execute(self, job):
+        spool = tempfile.SpooledTemporaryFile(max_size=JOB_SPOOL_MEMORY_BYTES)
+        try:
+            summary = job.run(job, spool)
+            with self._lock:
+                job.spool = spool
+                job.result_bytes = spool.tell()
+                job.summary = summary
+                job.status = "succeeded"
+                job.finished_at = time.time()
+        except Exception as e:
+            logger.error(f"Job {job.job_id} failed: {str(e)}")
+            spool.close()
+            with self._lock:
+                job.error = str(e)
+                job.status = "cancelled" if job.cancel_requested else "failed"
+                job.finished_at = time.time()
+        finally:
+            with self._lock:
+                job.run = None
+                self._running[job.target] -= 1
+            self._dispatch(job.target)
+
+
+# Initialize a global instance of JobManager
+job_manager = JobManager()
@@ -0,0 +1,115 @@
+import os
+import re
+import logging
+
+from connection_pool import MYSQL_TYPES, POSTGRES_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Result budgets for buffered /execute-sql responses
+QUERY_MAX_ROWS = int(os.environ.get("QUERY_MAX_ROWS", 10000))
+QUERY_MAX_BYTES = int(os.environ.get("QUERY_MAX_BYTES", 50 * 1024 * 1024))
+QUERY_AUTO_LIMIT = os.environ.get("QUERY_AUTO_LIMIT", "true").lower() == "true"
+FETCH_BATCH_SIZE = int(os.environ.get("FETCH_BATCH_SIZE", 500))
+
+# Approximate per-value overhead for non-text values and per-row bookkeeping
+VALUE_BYTES = 8
+ROW_OVERHEAD_BYTES = 16
+
+EXISTING_LIMIT_PATTERN = re.compile(
+    r"\blimit\s+\d+|\bfetch\s+(first|next)\b|\btop\s*\(?\s*\d+|\brownum\b",
+    re.IGNORECASE
+)
+LOCKING_CLAUSE_PATTERN = re.compile(r"\bfor\s+(update|share)\b[^)]*$|\binto\s+(outfile|dumpfile)\b", re.IGNORECASE)
+SELECT_HEAD_PATTERN = re.compile(r"^\s*select(\s+(distinct|all))?\s+", re.IGNORECASE)
+
+
+class InvalidBudgetError(Exception):
+    """Raised when a requested row/byte budget is not a positive integer."""
+
+
+def _positive_int(data, name):
+    value = data[name]
+    try:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError
+        value = int(value)
+    except ValueError:
+        raise InvalidBudgetError(f"{name} must be a positive integer")
+    if value <= 0:
+        raise InvalidBudgetError(f"{name} must be a positive integer")
+    return value
+
+
+def resolve_budget(data):
+    """Read per-request row/byte budgets, never exceeding the server limits."""
+    max_rows = QUERY_MAX_ROWS
+    max_bytes = QUERY_MAX_BYTES
+
+    if data.get("max_rows") is not None:
+        max_rows = min(_positive_int(data, "max_rows"), QUERY_MAX_ROWS)
+    if data.get("max_bytes") is not None:
+        max_bytes = min(_positive_int(data, "max_bytes"), QUERY_MAX_BYTES)
+
+    # Accept JSON booleans as well as the "true"/"false" strings used by the env flag
+    auto_limit = data.get("auto_limit", QUERY_AUTO_LIMIT)
+    if not isinstance(auto_limit, bool):
+        auto_limit = str(auto_limit).lower() == "true"
+    return max_rows, max_bytes, auto_limit
+
+
+def apply_row_limit(sql_query, db_type, limit):
+    """
+    Append a dialect-specific row limit to a SELECT that has none.
+    Queries that already limit their rows, or use locking/export clauses,
+    are returned unchanged; the fetch budget still applies to them.
+    """
+    query = sql_query.strip().rstrip(";").rstrip()
+
+    if ";" in query or EXISTING_LIMIT_PATTERN.search(query) or LOCKING_CLAUSE_PATTERN.search(query):
+        return sql_query
+
+    if db_type in MYSQL_TYPES or db_type == "sqlite":
+        return f"{query} LIMIT {limit}"
+    elif db_type in POSTGRES_TYPES:
+        return f"{query} FETCH FIRST {limit} ROWS ONLY"
+    elif db_type == "sqlserver":
+        match = SELECT_HEAD_PATTERN.match(query)
+        if match:
+            return f"{match.group(0)}TOP ({limit}) {query[match.end():]}"
+    return sql_query
+
+
+def estimate_row_bytes(row):
+    """Cheaply approximate the memory/wire size of a fetched row."""
+    size = ROW_OVERHEAD_BYTES
+    for value in row:
+        if isinstance(value, (str, bytes, bytearray)):
+            size += len(value)
+        else:
+            size += VALUE_BYTES
+    return size
+
+
+def fetch_with_budget(cursor, max_rows=QUERY_MAX_ROWS, max_bytes=QUERY_MAX_BYTES, batch_size=FETCH_BATCH_SIZE):
+    """
+    Fetch rows with fetchmany until the result ends or a budget is exhausted.
+
+    Returns:
+        tuple: (rows, truncated, byte_estimate)
+    """
+    rows = []
+    total_bytes = 0
+
+    while True:
+        batch = cursor.fetchmany(min(batch_size, max_rows - len(rows) + 1))
+        if not batch:
+            return rows, False, total_bytes
+
+        for row in batch:
+            row_bytes = estimate_row_bytes(row)
+            if len(rows) >= max_rows or total_bytes + row_bytes > max_bytes:
+                logger.warning(f"Result truncated at {len(rows)} rows / {total_bytes} bytes")
+                return rows, True, total_bytes
+            rows.append(row)
+            total_bytes += row_bytes
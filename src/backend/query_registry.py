@@ -0,0 +1,234 @@
+import os
+import math
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+
+from connection_pool import MYSQL_TYPES, POSTGRES_TYPES, open_connection
+
+logger = logging.getLogger(__name__)
+
+# Statement timeout configuration from environment variables
+QUERY_TIMEOUT_SECONDS = float(os.environ.get("QUERY_TIMEOUT_SECONDS", 60))
+QUERY_MAX_TIMEOUT_SECONDS = float(os.environ.get("QUERY_MAX_TIMEOUT_SECONDS", 600))
+# SQLite progress handler granularity (VM instructions between checks)
+SQLITE_PROGRESS_STEPS = int(os.environ.get("SQLITE_PROGRESS_STEPS", 10000))
+
+
+class QueryCancelledError(Exception):
+    """Raised when a running query was stopped through /cancel-query."""
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a running query exceeded its statement timeout."""
+
+
+class InvalidTimeoutError(Exception):
+    """Raised when a requested statement timeout is not a finite positive number."""
+
+
+def resolve_timeout(data):
+    """Read the per-request timeout in seconds, capped by the server maximum."""
+    timeout = data.get("timeout_seconds")
+    if timeout is None:
+        return min(QUERY_TIMEOUT_SECONDS, QUERY_MAX_TIMEOUT_SECONDS)
+    try:
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float, str)):
+            raise ValueError
+        timeout = float(timeout)
+    except ValueError:
+        raise InvalidTimeoutError("timeout_seconds must be a positive number")
+    if not math.isfinite(timeout) or timeout <= 0:
+        raise InvalidTimeoutError("timeout_seconds must be a positive number")
+    return min(timeout, QUERY_MAX_TIMEOUT_SECONDS)
+
+
+def get_backend_id(conn, db_type):
+    """Return the server-side session id used to cancel a running statement."""
+    if db_type in POSTGRES_TYPES:
+        return conn.get_backend_pid()
+    elif db_type in MYSQL_TYPES:
+        return conn.connection_id
+    elif db_type == "sqlserver":
+        cursor = conn.cursor()
+        cursor.execute("SELECT @@SPID")
+        spid = cursor.fetchone()[0]
+        cursor.close()
+        return spid
+    return None
+
+
+class QueryRegistry:
+    """Tracks in-flight queries so they can be listed, timed out and cancelled."""
+
+    def __init__(self):
+        self._queries = {}  # query_id -> entry dict
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, conn, config, sql_query, timeout=QUERY_TIMEOUT_SECONDS, query_id=None):
+        """
+        Apply a native statement timeout to `conn` and register the query
+        for the duration of the block.
+        """
+        db_type = config.get("dbType", "mysql").lower()
+        entry = {
+            "query_id": query_id or uuid.uuid4().hex,
+            "sql": sql_query,
+            "db_type": db_type,
+            "database": config.get("database", ""),
+            "started": time.time(),
+            "timeout": timeout,
+            "cancelled": False,
+            "conn": conn,
+            "config": config,
+            "backend_id": None
+        }
+
+        entry["deadline"] = entry["started"] + timeout if timeout else None
+
+        with self._lock:
+            if entry["query_id"] in self._queries:
+                raise ValueError(f"Query id {entry['query_id']} is already running")
+            self._queries[entry["query_id"]] = entry
+
+        try:
+            entry["backend_id"] = get_backend_id(conn, db_type)
+            self._apply_timeout(entry)
+            yield entry["query_id"]
+        except Exception as e:
+            elapsed = time.time() - entry["started"]
+            if entry["cancelled"]:
+                raise QueryCancelledError(f"Query {entry['query_id']} was cancelled after {elapsed:.2f}s") from e
+            if entry["deadline"] and time.time() >= entry["deadline"]:
+                raise QueryTimeoutError(f"Query exceeded the {timeout:g}s statement timeout") from e
+            raise
+        finally:
+            self._clear_timeout(entry)
+            with self._lock:
+                self._queries.pop(entry["query_id"], None)
+
+    def running(self):
+        """List in-flight queries with their elapsed time."""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "query_id": entry["query_id"],
+                    "sql": entry["sql"][:500],
+                    "db_type": entry["db_type"],
+                    "database": entry["database"],
+                    "elapsed_seconds": round(now - entry["started"], 2),
+                    "timeout_seconds": entry["timeout"],
+                    "cancelled": entry["cancelled"]
+                }
+                for entry in self._queries.values()
+            ]
+
+    def extend(self, query_id):
+        """
+        Restart the timeout of a long-lived query (a paged cursor) before it
+        does more work, so idle time between pages does not count against it.
+        """
+        with self._lock:
+            entry = self._queries.get(query_id)
+            if entry is None or not entry["timeout"]:
+                return False
+            entry["deadline"] = time.time() + entry["timeout"]
+            return True
+
+    def cancel(self, query_id):
+        """Ask the database to stop a running query. Returns False if unknown."""
+        with self._lock:
+            entry = self._queries.get(query_id)
+            if entry is None:
+                return False
+            entry["cancelled"] = True
+
+        db_type = entry["db_type"]
+        logger.info(f"Cancelling {db_type} query {query_id}")
+
+        if db_type == "sqlite":
+            entry["conn"].interrupt()
+            return True
+
+        if entry["backend_id"] is None:
+            raise Exception(f"Query {query_id} cannot be cancelled yet")
+
+        # Use a dedicated connection: the pool may be exhausted by the very queries being cancelled
+        conn = open_connection(entry["config"])
+        try:
+            cursor = conn.cursor()
+            if db_type in POSTGRES_TYPES:
+                cursor.execute("SELECT pg_cancel_backend(%s)", (int(entry["backend_id"]),))
+                cursor.fetchall()
+            elif db_type in MYSQL_TYPES:
+                cursor.execute(f"KILL QUERY {int(entry['backend_id'])}")
+            elif db_type == "sqlserver":
+                # SQL Server can only kill the whole session; the pool discards it on release
+                cursor.execute(f"KILL {int(entry['backend_id'])}")
+                conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        return True
+
+    def _apply_timeout(self, entry):
+        """Set the statement timeout natively for the entry's dialect."""
+        timeout = entry["timeout"]
+        if not timeout:
+            return
+
+        conn = entry["conn"]
+        db_type = entry["db_type"]
+
+        if db_type in POSTGRES_TYPES:
+            # SET LOCAL lasts until the transaction ends (commit or pool rollback)
+            cursor = conn.cursor()
+            cursor.execute(f"SET LOCAL statement_timeout = {int(timeout * 1000)}")
+            cursor.close()
+        elif db_type in MYSQL_TYPES:
+            self._set_mysql_timeout(conn, timeout)
+        elif db_type == "sqlite":
+            # A non-zero return value aborts the running statement
+            conn.set_progress_handler(
+                lambda: 1 if entry["cancelled"] or time.time() > entry["deadline"] else 0,
+                SQLITE_PROGRESS_STEPS
+            )
+        elif db_type == "sqlserver":
+            # pymssql exposes the per-connection query timeout on the underlying _mssql connection
+            if hasattr(conn, "_conn"):
+                conn._conn.query_timeout = max(1, int(timeout))
+
+    def _clear_timeout(self, entry):
+        """Undo session-level timeout settings before the connection is reused."""
+        if not entry["timeout"]:
+            return
+
+        conn = entry["conn"]
+        db_type = entry["db_type"]
+        try:
+            if db_type in MYSQL_TYPES:
+                self._set_mysql_timeout(conn, 0)
+            elif db_type == "sqlite":
+                conn.set_progress_handler(None, 0)
+            elif db_type == "sqlserver" and hasattr(conn, "_conn"):
+                conn._conn.query_timeout = 0
+        except Exception as e:
+            logger.warning(f"Failed to reset statement timeout: {str(e)}")
+
+    def _set_mysql_timeout(self, conn, timeout):
+        cursor = conn.cursor()
+        try:
+            # MySQL limits SELECTs in milliseconds; MariaDB uses max_statement_time in seconds
+            cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {int(timeout * 1000)}")
+        except Exception:
+            cursor.execute(f"SET SESSION max_statement_time = {float(timeout)}")
+        finally:
+            cursor.close()
+
+
+# Initialize a global instance of QueryRegistry
+query_registry = QueryRegistry()
@@ -0,0 +1,215 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from connection_pool import config_key
+from query_limits import estimate_row_bytes
+
+logger = logging.getLogger(__name__)
+
+# Result cache configuration from environment variables
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", 60))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 256))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Quoted literals/identifiers are kept verbatim when normalizing SQL
+QUOTED_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]")
+IDENTIFIER = r"((?:[`\"\[]?[\w$]+[`\"\]]?\.)*[`\"\[]?[\w$]+[`\"\]]?)"
+READ_TABLE_PATTERN = re.compile(r"\b(?:from|join)\s+" + IDENTIFIER, re.IGNORECASE)
+WRITE_TABLE_PATTERN = re.compile(
+    r"\b(?:insert\s+(?:ignore\s+)?into|replace\s+into|update|delete\s+from|merge\s+into|"
+    r"truncate(?:\s+table)?|(?:create|drop|alter)\s+table(?:\s+if\s+(?:not\s+)?exists)?)\s+" + IDENTIFIER,
+    re.IGNORECASE
+)
+# Results of these functions change between executions, so such queries are never cached
+VOLATILE_PATTERN = re.compile(
+    r"\b(now|rand|random|uuid|newid|sysdate|getdate|current_timestamp|current_date|current_time|"
+    r"localtimestamp|nextval|last_insert_id)\b",
+    re.IGNORECASE
+)
+
+
+def normalize_sql(sql_query):
+    """Lower-case and collapse whitespace outside quoted literals and identifiers."""
+    parts = []
+    last = 0
+    for match in QUOTED_PATTERN.finditer(sql_query):
+        parts.append(" ".join(sql_query[last:match.start()].lower().split()))
+        parts.append(match.group(0))
+        last = match.end()
+    parts.append(" ".join(sql_query[last:].lower().split()))
+    return " ".join(p for p in parts if p).rstrip(";").strip()
+
+
+def _table_names(pattern, sql_query):
+    stripped = QUOTED_PATTERN.sub(lambda m: m.group(0) if m.group(0)[0] in "`\"[" else "''", sql_query)
+    names = set()
+    for match in pattern.finditer(stripped):
+        name = match.group(1).split(".")[-1].strip("`\"[]").lower()
+        if name and name != "select":
+            names.add(name)
+    return names
+
+
+def read_tables(sql_query):
+    """Tables a SELECT reads from (FROM / JOIN targets)."""
+    return _table_names(READ_TABLE_PATTERN, sql_query)
+
+
+def write_tables(sql_query):
+    """Tables a write or DDL statement modifies; empty if they cannot be determined."""
+    return _table_names(WRITE_TABLE_PATTERN, sql_query)
+
+
+class ResultCache:
+    """
+    LRU cache of SELECT results keyed by connection identity and normalized
+    SQL. Entries expire after a TTL, the cache is bounded by entry count and
+    approximate size, and writes invalidate entries for the tables they touch.
+    Every invalidation also bumps the connection's generation, so a SELECT
+    that started before a write cannot store its now stale result afterwards.
+    """
+
+    def __init__(self, ttl=RESULT_CACHE_TTL_SECONDS, max_entries=RESULT_CACHE_MAX_ENTRIES,
+                 max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> entry dict, least recently used first
+        self._total_bytes = 0
+        self._generations = {}  # connection -> invalidation count
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "stale_stores_skipped": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+    def make_key(self, config, sql_query, *variant):
+        """Build a cache key from the connection, normalized SQL and result options."""
+        raw = repr((config_key(config), normalize_sql(sql_query), variant))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, sql_query):
+        """Only deterministic single SELECT statements are cached."""
+        query = sql_query.strip().rstrip(";")
+        return (
+            query.split()[0].upper() == "SELECT"
+            and ";" not in query
+            and not VOLATILE_PATTERN.search(query)
+        )
+
+    def generation(self, config):
+        """Invalidation generation of a connection; read it before executing a SELECT to cache."""
+        with self._lock:
+            return self._generations.get(config_key(config), 0)
+
+    def get(self, key):
+        """Return a cached result or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            if time.time() - entry["stored_at"] > self.ttl:
+                self._remove_locked(key)
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry["result"]
+
+    def put(self, key, config, sql_query, result, generation):
+        """
+        Store a SELECT result, evicting least recently used entries as needed.
+        Nothing is stored if the connection was invalidated since `generation`.
+        """
+        size = sum(estimate_row_bytes(row) for row in result.get("rows", []))
+        if size > self.max_bytes:
+            return
+
+        connection = config_key(config)
+        with self._lock:
+            if self._generations.get(connection, 0) != generation:
+                self._counters["stale_stores_skipped"] += 1
+                return
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = {
+                "result": result,
+                "connection": connection,
+                "tables": read_tables(sql_query),
+                "size": size,
+                "stored_at": time.time()
+            }
+            self._total_bytes += size
+            self._counters["stores"] += 1
+
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, config, tables=None):
+        """
+        Drop cached results for `tables` on a connection. Entries whose tables
+        could not be determined, or every entry when `tables` is empty, are dropped.
+        """
+        connection = config_key(config)
+        tables = {t.lower() for t in tables} if tables else None
+
+        with self._lock:
+            self._generations[connection] = self._generations.get(connection, 0) + 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry["connection"] == connection
+                and (tables is None or not entry["tables"] or entry["tables"] & tables)
+            ]
+            for key in stale:
+                self._remove_locked(key)
+            self._counters["invalidations"] += len(stale)
+
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached results for tables {sorted(tables) if tables else 'ALL'}")
+        return len(stale)
+
+    def clear(self):
+        """Drop every cached result."""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._total_bytes = 0
+        return count
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "enabled": RESULT_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                **self._counters
+            }
+
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry["size"]
+
+
+# Initialize a global instance of ResultCache
+result_cache = ResultCache()
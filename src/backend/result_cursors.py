@@ -0,0 +1,158 @@
+import os
+import time
+import uuid
+import logging
+import threading
+
+from connection_pool import POOL_MAX_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Cursor configuration from environment variables
+CURSOR_TTL_SECONDS = float(os.environ.get("CURSOR_TTL_SECONDS", 300))
+MAX_CURSORS_PER_SESSION = int(os.environ.get("MAX_CURSORS_PER_SESSION", 3))
+MAX_PAGE_SIZE = int(os.environ.get("CURSOR_MAX_PAGE_SIZE", 1000))
+# Every open cursor pins a pooled connection, so leave room for regular queries
+MAX_OPEN_CURSORS = int(os.environ.get("MAX_OPEN_CURSORS", max(1, POOL_MAX_SIZE // 2)))
+
+
+class CursorNotFoundError(Exception):
+    """Raised when a cursor id is unknown or has expired."""
+
+
+class CursorLimitError(Exception):
+    """Raised when every cursor slot is taken and no new cursor can be opened."""
+
+
+def parse_page_size(value):
+    """Validate a requested page size and cap it at MAX_PAGE_SIZE."""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError("page_size must be a positive integer")
+    try:
+        page_size = int(value)
+    except ValueError:
+        raise ValueError("page_size must be a positive integer")
+    if page_size <= 0:
+        raise ValueError("page_size must be a positive integer")
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+class CursorRegistry:
+    """
+    Keeps open RowStreams pinned to their pooled connection so a result set
+    can be paged through across requests. Cursors expire after
+    CURSOR_TTL_SECONDS of inactivity and each session may hold at most
+    MAX_CURSORS_PER_SESSION; opening another closes that session's oldest.
+    Session ids are chosen by clients, so at most MAX_OPEN_CURSORS may be
+    open in total; beyond that opening fails with CursorLimitError.
+    """
+
+    def __init__(self, ttl=CURSOR_TTL_SECONDS, max_per_session=MAX_CURSORS_PER_SESSION,
+                 max_open=MAX_OPEN_CURSORS):
+        self.ttl = ttl
+        self.max_per_session = max_per_session
+        self.max_open = max_open
+        self._cursors = {}  # cursor_id -> entry dict
+        self._lock = threading.Lock()
+
+    def open(self, session_id, stream, cursor_id=None):
+        """Register a RowStream and return its cursor id."""
+        cursor_id = cursor_id or uuid.uuid4().hex
+        now = time.time()
+
+        with self._lock:
+            stale = self._pop_expired_locked(now)
+            owned = sorted(
+                (entry["last_used"], cid)
+                for cid, entry in self._cursors.items()
+                if entry["session_id"] == session_id
+            )
+            while len(owned) >= self.max_per_session:
+                _, oldest = owned.pop(0)
+                stale.append(self._cursors.pop(oldest))
+                logger.info(f"Closing cursor {oldest}: session {session_id} reached the cursor limit")
+
+            full = len(self._cursors) >= self.max_open
+            if not full:
+                self._cursors[cursor_id] = {
+                    "stream": stream,
+                    "session_id": session_id,
+                    "created": now,
+                    "last_used": now,
+                    "lock": threading.Lock()
+                }
+
+        self._close_entries(stale)
+        if full:
+            raise CursorLimitError(f"All {self.max_open} cursors are in use, close one or retry later")
+        return cursor_id
+
+    def fetch(self, cursor_id, page_size=None):
+        """
+        Fetch the next page from an open cursor.
+
+        Returns:
+            tuple: (rows, has_more, row_count) - the cursor is closed once exhausted
+        """
+        with self._lock:
+            stale = self._pop_expired_locked(time.time())
+            entry = self._cursors.get(cursor_id)
+        self._close_entries(stale)
+
+        if entry is None:
+            raise CursorNotFoundError(f"Cursor {cursor_id} not found or expired")
+
+        with entry["lock"]:
+            stream = entry["stream"]
+            if page_size:
+                stream.batch_size = page_size
+            rows = stream.fetch_page()
+            has_more = len(rows) == stream.batch_size
+            entry["last_used"] = time.time()
+
+        if not has_more:
+            self.close(cursor_id)
+        return rows, has_more, stream.row_count
+
+    def close(self, cursor_id):
+        """Close a cursor and release its connection. Returns False if unknown."""
+        with self._lock:
+            entry = self._cursors.pop(cursor_id, None)
+        if entry is None:
+            return False
+        self._close_entries([entry])
+        return True
+
+    def sweep(self):
+        """Close every expired cursor and return how many were removed."""
+        with self._lock:
+            stale = self._pop_expired_locked(time.time())
+        self._close_entries(stale)
+        return len(stale)
+
+    def stats(self):
+        """Return the number of open cursors per session."""
+        with self._lock:
+            sessions = {}
+            for entry in self._cursors.values():
+                sessions[entry["session_id"]] = sessions.get(entry["session_id"], 0) + 1
+            return {
+                "open_cursors": len(self._cursors),
+                "sessions": sessions,
+                "ttl_seconds": self.ttl,
+                "max_per_session": self.max_per_session,
+                "max_open": self.max_open
+            }
+
+    def _pop_expired_locked(self, now):
+        expired = [cid for cid, entry in self._cursors.items() if now - entry["last_used"] > self.ttl]
+        return [self._cursors.pop(cid) for cid in expired]
+
+    def _close_entries(self, entries):
+        for entry in entries:
+            with entry["lock"]:
+                entry["stream"].close()
+
+
+# Initialize a global instance of CursorRegistry
+cursor_registry = CursorRegistry()
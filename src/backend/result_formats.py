@@ -0,0 +1,245 @@
+import os
+import gzip
+import zlib
+import logging
+import datetime
+import decimal
+
+from mysql.connector import FieldType
+import psycopg2.extensions
+
+from connection_pool import MYSQL_TYPES, POSTGRES_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Optional binary encoders - formats are only offered when installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Responses smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", 6))
+# Rows encoded per write when a payload is produced in pieces
+PAYLOAD_BATCH_ROWS = int(os.environ.get("PAYLOAD_BATCH_ROWS", 500))
+
+RESULT_FORMATS = {
+    "json": "application/json",
+    "compact": "application/json",
+    "msgpack": "application/x-msgpack",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+
+class UnsupportedFormatError(Exception):
+    """Raised when a result format is unknown or its encoder is not installed."""
+
+
+def negotiate_format(requested, accept_header=""):
+    """Pick a result format from an explicit request value or the Accept header."""
+    if requested is not None and not isinstance(requested, str):
+        raise UnsupportedFormatError(f"Result format must be a string, got {type(requested).__name__}")
+    if requested:
+        result_format = requested.lower()
+    elif "application/vnd.apache.arrow.stream" in accept_header:
+        result_format = "arrow"
+    elif "application/x-msgpack" in accept_header or "application/msgpack" in accept_header:
+        result_format = "msgpack"
+    else:
+        result_format = "json"
+
+    if result_format not in RESULT_FORMATS:
+        raise UnsupportedFormatError(
+            f"Unsupported result format: {result_format}. Available formats are: {', '.join(RESULT_FORMATS)}"
+        )
+    if result_format == "msgpack" and msgpack is None:
+        raise UnsupportedFormatError("MessagePack results require the 'msgpack' package")
+    if result_format == "arrow" and pa is None:
+        raise UnsupportedFormatError("Arrow results require the 'pyarrow' package")
+    return result_format
+
+
+def infer_type_name(value):
+    """Map a Python value returned by a driver to a portable type name."""
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, decimal.Decimal):
+        return "decimal"
+    if isinstance(value, datetime.datetime):
+        return "datetime"
+    if isinstance(value, datetime.date):
+        return "date"
+    if isinstance(value, (datetime.time, datetime.timedelta)):
+        return "time"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "binary"
+    return "string"
+
+
+def describe_columns(cursor, db_type, rows):
+    """
+    Build column names and types from cursor.description.
+    Native type names are used where the driver exposes them cheaply;
+    otherwise the type is inferred from the first non-null value.
+    """
+    columns = []
+    types = []
+
+    for index, desc in enumerate(cursor.description or []):
+        columns.append(desc[0])
+        type_code = desc[1]
+        type_name = None
+
+        try:
+            if db_type in MYSQL_TYPES and type_code is not None:
+                type_name = FieldType.get_info(type_code)
+            elif db_type in POSTGRES_TYPES and type_code is not None:
+                caster = psycopg2.extensions.string_types.get(type_code)
+                type_name = caster.name if caster else None
+        except Exception:
+            type_name = None
+
+        if not type_name:
+            sample = next((row[index] for row in rows if row[index] is not None), None)
+            type_name = infer_type_name(sample) if sample is not None else "null"
+        types.append(type_name.lower())
+
+    return columns, types
+
+
+def build_payload(result, result_format):
+    """Turn an executed query result into the response body for JSON-like formats."""
+    payload, rows_key = _payload_head(result, result_format)
+    if rows_key:
+        payload[rows_key] = [_render_row(result, row, result_format) for row in result["rows"]]
+    return payload
+
+
+def payload_chunks(result, result_format, dumps, batch_rows=PAYLOAD_BATCH_ROWS):
+    """
+    Yield the JSON encoding of build_payload() in pieces, one batch of rows
+    at a time, so the complete document is never held in memory.
+    """
+    payload, rows_key = _payload_head(result, result_format)
+    if not rows_key:
+        yield dumps(payload)
+        return
+
+    yield dumps(payload)[:-1] + ", " + dumps(rows_key) + ": ["
+    rows = result["rows"]
+    for start in range(0, len(rows), batch_rows):
+        chunk = ",".join(dumps(_render_row(result, row, result_format)) for row in rows[start:start + batch_rows])
+        yield chunk if start == 0 else "," + chunk
+    yield "]}"
+
+
+def _payload_head(result, result_format):
+    """Everything but the rows, plus the key the rows go under (None for writes)."""
+    if result["query_type"] != "SELECT":
+        affected_rows = result["affected_rows"]
+        return {
+            "success": True,
+            "message": f"Query executed successfully. Affected {affected_rows} rows.",
+            "query_type": result["query_type"],
+            "result": [{"affected_rows": affected_rows}]
+        }, None
+
+    rows = result["rows"]
+    truncated = result.get("truncated", False)
+    payload = {
+        "success": True,
+        "message": f"Query executed successfully. Returned {len(rows)} rows"
+                   f"{' (truncated by the result limit)' if truncated else ''}.",
+        "query_type": result["query_type"],
+        "truncated": truncated,
+        "cached": result.get("cached", False)
+    }
+
+    if result_format == "json":
+        return payload, "result"
+    payload["columns"] = result["columns"]
+    payload["types"] = result["types"]
+    return payload, "rows"
+
+
+def _render_row(result, row, result_format):
+    if result_format == "json":
+        return dict(zip(result["columns"], row))
+    return list(row)
+
+
+def _msgpack_default(value):
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    return str(value)
+
+
+def encode_msgpack(payload):
+    """Encode a compact payload as MessagePack bytes."""
+    return msgpack.packb(payload, default=_msgpack_default, use_bin_type=True)
+
+
+def encode_arrow(result):
+    """Encode a query result as an Arrow IPC stream of record batches."""
+    if result["query_type"] != "SELECT":
+        table = pa.table({"affected_rows": [result["affected_rows"]]})
+    else:
+        arrays = []
+        for index, name in enumerate(result["columns"]):
+            values = [row[index] for row in result["rows"]]
+            try:
+                arrays.append(pa.array(values))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Mixed-type columns (common in SQLite) fall back to strings
+                arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+        table = pa.Table.from_arrays(arrays, names=result["columns"])
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick gzip or deflate from an Accept-Encoding header, or None."""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+
+    for encoding in ("gzip", "deflate"):
+        if accepted.get(encoding, 0) > 0:
+            return encoding
+    return None
+
+
+def compress_body(body, encoding):
+    """Compress a response body with the negotiated content encoding."""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=COMPRESS_LEVEL)
+    if encoding == "deflate":
+        return zlib.compress(body, COMPRESS_LEVEL)
+    return body
@@ -0,0 +1,149 @@
+import os
+import uuid
+import logging
+
+from connection_pool import MYSQL_TYPES, POSTGRES_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Number of rows pulled from the server per fetchmany() call
+STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE", 500))
+
+
+def open_stream_cursor(conn, db_type):
+    """Open a cursor that reads rows from the server incrementally."""
+    if db_type in POSTGRES_TYPES:
+        # Named cursors are server-side: rows stay on the server until fetched
+        cursor = conn.cursor(name=f"sqlify_stream_{uuid.uuid4().hex}")
+        cursor.itersize = STREAM_BATCH_SIZE
+        return cursor
+    elif db_type in MYSQL_TYPES:
+        return conn.cursor(buffered=False)
+    # SQLite and pymssql cursors already fetch lazily
+    return conn.cursor()
+
+
+class RowStream:
+    """
+    Executes a SELECT on a pooled connection and yields its rows in batches.
+    The query runs (and fails) eagerly on construction so errors can still be
+    reported as a normal JSON response; the connection is held until the
+    stream is exhausted or closed.
+
+    `track` is an optional callable taking the connection and returning a
+    context manager (e.g. QueryRegistry.track) that stays entered for the
+    lifetime of the stream and sees any error raised while fetching.
+    """
+
+    def __init__(self, pool, sql_query, batch_size=STREAM_BATCH_SIZE, track=None):
+        self.pool = pool
+        self.db_type = pool.db_type
+        self.batch_size = batch_size
+        self.row_count = 0
+        self.conn = pool.acquire()
+        self.cursor = None
+        self._tracking = None
+
+        try:
+            if track is not None:
+                tracking = track(self.conn)
+                tracking.__enter__()
+                self._tracking = tracking
+            self.cursor = open_stream_cursor(self.conn, self.db_type)
+            self.cursor.execute(sql_query)
+            # Named Postgres cursors only populate description after the first fetch
+            self._pending = self.cursor.fetchmany(self.batch_size)
+            self.columns = [desc[0] for desc in self.cursor.description or []]
+        except Exception as e:
+            self.close(e)
+            raise
+
+    def fetch_page(self):
+        """Fetch the next batch of rows as dicts; an empty list means the end."""
+        if self._pending is not None:
+            rows, self._pending = self._pending, None
+        elif self.conn is not None:
+            try:
+                rows = self.cursor.fetchmany(self.batch_size)
+            except Exception as e:
+                self.close(e)
+                raise
+        else:
+            rows = []
+        self.row_count += len(rows)
+        return [dict(zip(self.columns, row)) for row in rows]
+
+    def batches(self):
+        """Yield lists of row dicts until the result set is exhausted."""
+        try:
+            while True:
+                rows = self.fetch_page()
+                if not rows:
+                    break
+                yield rows
+        finally:
+            self.close()
+
+    def close(self, error=None):
+        """
+        Release the cursor and hand the connection back to the pool. When
+        closing because of `error`, the tracking context may raise a more
+        specific exception in its place (e.g. a timeout or cancellation).
+        """
+        if self.conn is None:
+            return
+        conn, self.conn = self.conn, None
+
+        try:
+            if self.cursor is not None:
+                try:
+                    if self.db_type in MYSQL_TYPES:
+                        # Unbuffered MySQL cursors must drain unread rows before reuse
+                        conn.consume_results()
+                    self.cursor.close()
+                except Exception as e:
+                    logger.warning(f"Error closing streaming cursor: {str(e)}")
+
+            tracking, self._tracking = self._tracking, None
+            if tracking is not None:
+                if error is None:
+                    tracking.__exit__(None, None, None)
+                else:
+                    tracking.__exit__(type(error), error, error.__traceback__)
+        finally:
+            self.pool.release(conn)
+
+
+def ndjson_chunks(stream, dumps):
+    """Render a RowStream as newline-delimited JSON, one row per line."""
+    try:
+        for rows in stream.batches():
+            yield "".join(dumps(row) + "\n" for row in rows)
+    except Exception as e:
+        logger.error(f"Streaming query failed after {stream.row_count} rows: {str(e)}")
+        yield dumps({"error": str(e), "row_count": stream.row_count}) + "\n"
+
+
+def json_chunks(stream, dumps, query_type):
+    """Render a RowStream as a single JSON document emitted in chunks."""
+    yield (
+        '{"success": true, "query_type": ' + dumps(query_type)
+        + ', "columns": ' + dumps(stream.columns)
+        + ', "result": ['
+    )
+
+    error = None
+    first = True
+    try:
+        for rows in stream.batches():
+            chunk = ",".join(dumps(row) for row in rows)
+            yield chunk if first else "," + chunk
+            first = False
+    except Exception as e:
+        logger.error(f"Streaming query failed after {stream.row_count} rows: {str(e)}")
+        error = str(e)
+
+    tail = '], "row_count": ' + str(stream.row_count)
+    if error:
+        tail += ', "error": ' + dumps(error)
+    yield tail + "}"
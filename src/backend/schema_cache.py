@@ -0,0 +1,154 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+
+from connection_pool import config_key
+from schema_introspection import dialect_of
+
+logger = logging.getLogger(__name__)
+
+# Schema cache configuration from environment variables
+# Snapshots younger than this are served without probing the catalog version
+SCHEMA_CHECK_INTERVAL_SECONDS = float(os.environ.get("SCHEMA_CHECK_INTERVAL_SECONDS", 2))
+SCHEMA_CACHE_MAX_ENTRIES = int(os.environ.get("SCHEMA_CACHE_MAX_ENTRIES", 32))
+
+DDL_PATTERN = re.compile(r"\b(create|alter|drop|rename)\s+(\w+\s+)*?(table|view|index|schema|database)\b", re.IGNORECASE)
+
+# Cheap catalog probes whose result changes whenever the schema does
+SCHEMA_VERSION_SQL = {
+    "sqlite": "PRAGMA schema_version",
+    "postgres": """
+        SELECT md5(coalesce(string_agg(v, ',' ORDER BY v), ''))
+        FROM (
+            SELECT c.oid::text || ':' || c.xmin::text AS v
+            FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public'
+            UNION ALL
+            SELECT a.attrelid::text || '.' || a.attnum::text || ':' || a.xmin::text
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND a.attnum > 0
+            UNION ALL
+            SELECT con.oid::text || ':' || con.xmin::text
+            FROM pg_constraint con JOIN pg_namespace n ON n.oid = con.connamespace
+            WHERE n.nspname = 'public'
+        ) catalog
+    """,
+    "mysql": """
+        SELECT COUNT(*), MAX(CREATE_TIME), MAX(UPDATE_TIME), SUM(CRC32(TABLE_NAME)),
+               (SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE())
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE()
+    """,
+    "sqlserver": "SELECT COUNT(*), MAX(modify_date) FROM sys.objects WHERE is_ms_shipped = 0"
+}
+
+
+def is_schema_change(sql_query):
+    """Whether a statement may change the schema (DDL)."""
+    return bool(DDL_PATTERN.search(sql_query))
+
+
+def schema_version(conn, db_type):
+    """
+    Return an opaque token that changes when the schema changes,
+    or None if the dialect has no cheap probe.
+    """
+    sql = SCHEMA_VERSION_SQL.get(dialect_of(db_type))
+    if sql is None:
+        return None
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql)
+        return "|".join(str(value) for value in cursor.fetchone())
+    finally:
+        cursor.close()
+
+
+class SchemaCache:
+    """
+    Introspected schema snapshots per connection. A snapshot stays valid
+    while the catalog version probe returns the same token; each snapshot
+    carries an ETag derived from its content.
+    """
+
+    def __init__(self, check_interval=SCHEMA_CHECK_INTERVAL_SECONDS, max_entries=SCHEMA_CACHE_MAX_ENTRIES):
+        self.check_interval = check_interval
+        self.max_entries = max_entries
+        self._snapshots = {}  # connection key -> snapshot dict
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, config, conn, introspect):
+        """
+        Return the current snapshot for a connection, calling `introspect(conn)`
+        only when there is no snapshot or the schema version changed.
+
+        Returns:
+            tuple: (snapshot, from_cache)
+        """
+        key = config_key(config)
+        db_type = config.get("dbType", "mysql").lower()
+
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+        if snapshot and time.time() - snapshot["checked_at"] < self.check_interval:
+            return self._hit(snapshot), True
+
+        try:
+            version = schema_version(conn, db_type)
+        except Exception as e:
+            logger.warning(f"Schema version probe failed, introspecting: {str(e)}")
+            version = None
+
+        if snapshot and version is not None and snapshot["version"] == version:
+            snapshot["checked_at"] = time.time()
+            return self._hit(snapshot), True
+
+        with self._lock:
+            self._counters["misses"] += 1
+
+        tables = introspect(conn)
+        body = json.dumps(tables, sort_keys=True, default=str)
+        snapshot = {
+            "tables": tables,
+            "version": version,
+            "etag": hashlib.sha256(body.encode("utf-8")).hexdigest()[:32],
+            "built_at": time.time(),
+            "checked_at": time.time()
+        }
+
+        # Without a version probe the snapshot cannot be validated later
+        if version is not None:
+            with self._lock:
+                if key not in self._snapshots and len(self._snapshots) >= self.max_entries:
+                    oldest = min(self._snapshots, key=lambda k: self._snapshots[k]["checked_at"])
+                    del self._snapshots[oldest]
+                self._snapshots[key] = snapshot
+        return snapshot, False
+
+    def invalidate(self, config):
+        """Drop the snapshot of a connection after a known schema change."""
+        with self._lock:
+            if self._snapshots.pop(config_key(config), None) is not None:
+                self._counters["invalidations"] += 1
+
+    def stats(self):
+        """Return snapshot count and hit/miss counters."""
+        with self._lock:
+            return {"snapshots": len(self._snapshots), **self._counters}
+
+    def _hit(self, snapshot):
+        with self._lock:
+            self._counters["hits"] += 1
+        return snapshot
+
+
+# Initialize a global instance of SchemaCache
+schema_cache = SchemaCache()
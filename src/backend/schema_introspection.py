@@ -0,0 +1,311 @@
+import logging
+
+from connection_pool import MYSQL_TYPES, POSTGRES_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Every dialect returns rows in these shapes, ordered by table then position:
+#   columns:      (table, column, data_type, nullable, default, primary_key)
+#   foreign keys: (table, column, referenced_table, referenced_column)
+#   indexes:      (table, index_name, unique, column)
+
+MYSQL_COLUMNS_SQL = """
+    SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE = 'YES', COLUMN_DEFAULT, COLUMN_KEY = 'PRI'
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND (%(table)s IS NULL OR TABLE_NAME = %(table)s)
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+"""
+
+MYSQL_FOREIGN_KEYS_SQL = """
+    SELECT TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+    FROM information_schema.KEY_COLUMN_USAGE
+    WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL
+      AND (%(table)s IS NULL OR TABLE_NAME = %(table)s)
+    ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+"""
+
+MYSQL_INDEXES_SQL = """
+    SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE = 0, COLUMN_NAME
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE() AND (%(table)s IS NULL OR TABLE_NAME = %(table)s)
+    ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+"""
+
+POSTGRES_COLUMNS_SQL = """
+    SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod), NOT a.attnotnull,
+           pg_get_expr(d.adbin, d.adrelid),
+           EXISTS (
+               SELECT 1 FROM pg_index ix
+               WHERE ix.indrelid = c.oid AND ix.indisprimary AND a.attnum = ANY (ix.indkey)
+           )
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    LEFT JOIN pg_attrdef d ON d.adrelid = c.oid AND d.adnum = a.attnum
+    WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')
+      AND (%(table)s IS NULL OR c.relname = %(table)s)
+    ORDER BY c.relname, a.attnum
+"""
+
+POSTGRES_FOREIGN_KEYS_SQL = """
+    SELECT rel.relname, att.attname, frel.relname, fatt.attname
+    FROM pg_constraint con
+    JOIN pg_class rel ON rel.oid = con.conrelid
+    JOIN pg_namespace n ON n.oid = rel.relnamespace
+    JOIN pg_class frel ON frel.oid = con.confrelid
+    CROSS JOIN LATERAL unnest(con.conkey, con.confkey) WITH ORDINALITY AS k(attnum, fattnum, ord)
+    JOIN pg_attribute att ON att.attrelid = con.conrelid AND att.attnum = k.attnum
+    JOIN pg_attribute fatt ON fatt.attrelid = con.confrelid AND fatt.attnum = k.fattnum
+    WHERE n.nspname = 'public' AND con.contype = 'f'
+      AND (%(table)s IS NULL OR rel.relname = %(table)s)
+    ORDER BY rel.relname, con.conname, k.ord
+"""
+
+POSTGRES_INDEXES_SQL = """
+    SELECT t.relname, i.relname, ix.indisunique, a.attname
+    FROM pg_index ix
+    JOIN pg_class t ON t.oid = ix.indrelid
+    JOIN pg_class i ON i.oid = ix.indexrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    CROSS JOIN LATERAL unnest(ix.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+    JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+    WHERE n.nspname = 'public' AND t.relkind IN ('r', 'p')
+      AND (%(table)s IS NULL OR t.relname = %(table)s)
+    ORDER BY t.relname, i.relname, k.ord
+"""
+
+# pragma_* table-valued functions (SQLite 3.16+) turn per-table PRAGMAs into joins
+SQLITE_COLUMNS_SQL = """
+    SELECT m.name, p.name, p.type, NOT p."notnull", p.dflt_value, p.pk > 0
+    FROM sqlite_master m
+    JOIN pragma_table_info(m.name) p
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%' AND (:table IS NULL OR m.name = :table)
+    ORDER BY m.name, p.cid
+"""
+
+SQLITE_FOREIGN_KEYS_SQL = """
+    SELECT m.name, f."from", f."table", f."to"
+    FROM sqlite_master m
+    JOIN pragma_foreign_key_list(m.name) f
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%' AND (:table IS NULL OR m.name = :table)
+    ORDER BY m.name, f.id, f.seq
+"""
+
+SQLITE_INDEXES_SQL = """
+    SELECT m.name, il.name, il."unique", ii.name
+    FROM sqlite_master m
+    JOIN pragma_index_list(m.name) il
+    JOIN pragma_index_info(il.name) ii
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%' AND (:table IS NULL OR m.name = :table)
+    ORDER BY m.name, il.name, ii.seqno
+"""
+
+SQLSERVER_COLUMNS_SQL = """
+    SELECT t.name, c.name,
+           CASE
+               WHEN ty.name IN ('varchar', 'char', 'varbinary', 'binary')
+                   THEN ty.name + '(' + CASE WHEN c.max_length = -1 THEN 'max' ELSE CAST(c.max_length AS varchar(10)) END + ')'
+               WHEN ty.name IN ('nvarchar', 'nchar')
+                   THEN ty.name + '(' + CASE WHEN c.max_length = -1 THEN 'max' ELSE CAST(c.max_length / 2 AS varchar(10)) END + ')'
+               WHEN ty.name IN ('decimal', 'numeric')
+                   THEN ty.name + '(' + CAST(c.precision AS varchar(10)) + ',' + CAST(c.scale AS varchar(10)) + ')'
+               ELSE ty.name
+           END,
+           c.is_nullable, dc.definition,
+           CASE WHEN EXISTS (
+               SELECT 1 FROM sys.indexes i
+               JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+               WHERE i.object_id = t.object_id AND i.is_primary_key = 1 AND ic.column_id = c.column_id
+           ) THEN 1 ELSE 0 END
+    FROM sys.tables t
+    JOIN sys.columns c ON c.object_id = t.object_id
+    JOIN sys.types ty ON ty.user_type_id = c.user_type_id
+    LEFT JOIN sys.default_constraints dc ON dc.object_id = c.default_object_id
+    WHERE t.is_ms_shipped = 0 AND (%(table)s IS NULL OR t.name = %(table)s)
+    ORDER BY t.name, c.column_id
+"""
+
+SQLSERVER_FOREIGN_KEYS_SQL = """
+    SELECT t.name, c.name, rt.name, rc.name
+    FROM sys.foreign_key_columns fkc
+    JOIN sys.tables t ON t.object_id = fkc.parent_object_id
+    JOIN sys.columns c ON c.object_id = fkc.parent_object_id AND c.column_id = fkc.parent_column_id
+    JOIN sys.tables rt ON rt.object_id = fkc.referenced_object_id
+    JOIN sys.columns rc ON rc.object_id = fkc.referenced_object_id AND rc.column_id = fkc.referenced_column_id
+    WHERE t.is_ms_shipped = 0 AND (%(table)s IS NULL OR t.name = %(table)s)
+    ORDER BY t.name, fkc.constraint_object_id, fkc.constraint_column_id
+"""
+
+SQLSERVER_INDEXES_SQL = """
+    SELECT t.name, i.name, i.is_unique, c.name
+    FROM sys.indexes i
+    JOIN sys.tables t ON t.object_id = i.object_id
+    JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+    JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+    WHERE t.is_ms_shipped = 0 AND i.name IS NOT NULL AND ic.is_included_column = 0
+      AND (%(table)s IS NULL OR t.name = %(table)s)
+    ORDER BY t.name, i.name, ic.key_ordinal
+"""
+
+# Table lists with planner/statistics row estimates instead of COUNT(*)
+MYSQL_TABLE_LIST_SQL = """
+    SELECT TABLE_NAME, TABLE_TYPE, TABLE_ROWS, COUNT(*) OVER ()
+    FROM information_schema.TABLES
+    WHERE TABLE_SCHEMA = DATABASE() AND LOWER(TABLE_NAME) LIKE %(pattern)s
+    ORDER BY TABLE_NAME
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+POSTGRES_TABLE_LIST_SQL = """
+    SELECT c.relname,
+           CASE c.relkind WHEN 'v' THEN 'VIEW' WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'BASE TABLE' END,
+           CASE WHEN c.reltuples < 0 THEN NULL ELSE c.reltuples::bigint END,
+           COUNT(*) OVER ()
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p', 'v', 'm') AND LOWER(c.relname) LIKE %(pattern)s
+    ORDER BY c.relname
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+# sqlite_stat1 only exists once ANALYZE has run; its stat column starts with the row count
+SQLITE_TABLE_LIST_SQL = """
+    SELECT m.name, CASE m.type WHEN 'view' THEN 'VIEW' ELSE 'BASE TABLE' END, {estimate}, COUNT(*) OVER ()
+    FROM sqlite_master m
+    WHERE m.type IN ('table', 'view') AND m.name NOT LIKE 'sqlite_%' AND LOWER(m.name) LIKE :pattern
+    ORDER BY m.name
+    LIMIT :limit OFFSET :offset
+"""
+SQLITE_STAT_ESTIMATE = """(
+    SELECT CAST(substr(s.stat, 1, instr(s.stat || ' ', ' ') - 1) AS INTEGER)
+    FROM sqlite_stat1 s WHERE s.tbl = m.name LIMIT 1
+)"""
+
+SQLSERVER_TABLE_LIST_SQL = """
+    SELECT t.name, 'BASE TABLE', SUM(p.rows), COUNT(*) OVER ()
+    FROM sys.tables t
+    JOIN sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1)
+    WHERE t.is_ms_shipped = 0 AND LOWER(t.name) LIKE %(pattern)s
+    GROUP BY t.name
+    ORDER BY t.name
+    OFFSET %(offset)s ROWS FETCH NEXT %(limit)s ROWS ONLY
+"""
+
+CATALOG_QUERIES = {
+    "mysql": (MYSQL_COLUMNS_SQL, MYSQL_FOREIGN_KEYS_SQL, MYSQL_INDEXES_SQL),
+    "postgres": (POSTGRES_COLUMNS_SQL, POSTGRES_FOREIGN_KEYS_SQL, POSTGRES_INDEXES_SQL),
+    "sqlite": (SQLITE_COLUMNS_SQL, SQLITE_FOREIGN_KEYS_SQL, SQLITE_INDEXES_SQL),
+    "sqlserver": (SQLSERVER_COLUMNS_SQL, SQLSERVER_FOREIGN_KEYS_SQL, SQLSERVER_INDEXES_SQL)
+}
+
+
+def dialect_of(db_type):
+    """Collapse database type aliases to the dialect used for catalog queries."""
+    if db_type in MYSQL_TYPES:
+        return "mysql"
+    if db_type in POSTGRES_TYPES:
+        return "postgres"
+    return db_type
+
+
+def introspect_schema(conn, db_type, table=None):
+    """
+    Read every table's columns, keys and indexes with one query per catalog,
+    regardless of the number of tables. Pass `table` to describe just one.
+
+    Returns:
+        list: table dicts in the /get-full-schema format
+    """
+    dialect = dialect_of(db_type)
+    if dialect not in CATALOG_QUERIES:
+        raise ValueError(f"Schema introspection is not supported for {db_type}")
+
+    columns_sql, foreign_keys_sql, indexes_sql = CATALOG_QUERIES[dialect]
+    params = {"table": table}
+    cursor = conn.cursor()
+    try:
+        cursor.execute(columns_sql, params)
+        columns = cursor.fetchall()
+        cursor.execute(foreign_keys_sql, params)
+        foreign_keys = cursor.fetchall()
+        cursor.execute(indexes_sql, params)
+        indexes = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    return assemble_tables(columns, foreign_keys, indexes)
+
+
+def assemble_tables(columns, foreign_keys, indexes):
+    """Group flat catalog rows into per-table column, foreign key and index lists."""
+    tables = {}
+    for table, name, data_type, nullable, default, primary_key in columns:
+        table_schema = tables.setdefault(table, {"name": table, "columns": [], "indexes": []})
+        table_schema["columns"].append({
+            "name": name,
+            "data_type": data_type,
+            "nullable": bool(nullable),
+            "primary_key": bool(primary_key),
+            "foreign_key": None,
+            "default": default
+        })
+
+    for table, column, ref_table, ref_column in foreign_keys:
+        for col in tables.get(table, {}).get("columns", []):
+            if col["name"] == column and col["foreign_key"] is None:
+                col["foreign_key"] = {"table": ref_table, "column": ref_column}
+
+    index_lookup = {}
+    for table, index_name, unique, column in indexes:
+        if table not in tables:
+            continue
+        index = index_lookup.get((table, index_name))
+        if index is None:
+            index = {"name": index_name, "columns": [], "unique": bool(unique)}
+            index_lookup[(table, index_name)] = index
+            tables[table]["indexes"].append(index)
+        index["columns"].append(column)
+
+    return list(tables.values())
+
+
+def list_tables(conn, db_type, name_filter="", limit=100, offset=0):
+    """
+    List one page of tables with cheap row-count estimates (None when the
+    database has no statistics yet), optionally filtered by a name substring.
+
+    Returns:
+        tuple: (tables, total)
+    """
+    dialect = dialect_of(db_type)
+    params = {"pattern": f"%{name_filter.lower()}%", "limit": int(limit), "offset": int(offset)}
+
+    if dialect == "mysql":
+        sql = MYSQL_TABLE_LIST_SQL
+    elif dialect == "postgres":
+        sql = POSTGRES_TABLE_LIST_SQL
+    elif dialect == "sqlserver":
+        sql = SQLSERVER_TABLE_LIST_SQL
+    elif dialect == "sqlite":
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        has_stats = cursor.fetchone() is not None
+        cursor.close()
+        sql = SQLITE_TABLE_LIST_SQL.format(estimate=SQLITE_STAT_ESTIMATE if has_stats else "NULL")
+    else:
+        raise ValueError(f"Schema introspection is not supported for {db_type}")
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    tables = [
+        {"name": name, "type": table_type, "row_estimate": int(estimate) if estimate is not None else None}
+        for name, table_type, estimate, _ in rows
+    ]
+    # The window count is only available on a non-empty page
+    total = rows[0][3] if rows else (0 if offset == 0 else None)
+    return tables, total